@@ -10,24 +10,51 @@
 VERSION = 'v.1.2.0'
 
 # utility modules
+import hashlib
+import math
 import os
-import pickle
 import re
+import time
 from functools import partial
 from importlib import *
 
-# Maya modules
-import pymel.core as pm
-import maya.OpenMaya as om
-import maya.mel as mel
-import maya.cmds as mc
+# package modules are only reloaded in dev mode, see run.reloadModules
+
+# Maya backend, maya.cmds and OpenMaya 2.0 only
+import backend
 
 # QT modules
 from PySide2 import QtCore, QtWidgets, QtGui
 
 # UI modules
 import ui
-reload(ui)
+
+# selection sync engine
+import sync
+
+# name resolution cache
+import resolver
+
+# command button code cache
+import command
+
+# layout file format
+import npk
+
+# worker tasks and their thread pools
+import tasks
+
+# background image decoding
+import images
+
+# layout saving on a worker thread
+import saver
+
+# library metadata index
+import library
+
+# layout loading on a thread pool
+import loader
 
 # global vars
 FONT_NAME = 'Fixedsys'
@@ -50,6 +77,15 @@ white = QtGui.QColor(255, 255, 255)
 HIGHLIGHT_COLOR = QtGui.QColor(225, 225, 225)
 DEFAULT_COLOR = yellow
 DEFAULT_SIZE = 15
+LABEL_MARGIN = 4.0  # around the button labels, the QTextDocument margin of the old label items
+LABEL_POS = QtCore.QPointF(-1 + LABEL_MARGIN, -5.4 + LABEL_MARGIN)  # top left of the pick button labels
+CMD_LABEL_SCALE = 0.65223
+
+#### level of detail vars
+LOD_FULL, LOD_NO_LABEL, LOD_FLAT = range(3)
+LOD_LABEL_HEIGHT = 5.0  # labels shorter than this on screen, in pixels, are not drawn
+LOD_FLAT_SIZE = 6.0  # buttons smaller than this on screen, in pixels, are drawn as plain rects
+CACHE_SCALES = (0.25, 0.35, 0.5, 0.71, 1.0, 1.41, 2.0, 2.83, 4.0, 5.66, 8.0)  # zoom steps the buttons are rasterized at, closer is not cached
 
 #### ui vars
 WINDOW_NAME = 'nuPicker'
@@ -59,6 +95,23 @@ MULTIPLE_VALUE_DISPLAY = '<multiple>'
 ZOOM_STEP = 0.05
 UNDO_LIMIT = 100
 MAX_TOOLTIP_OBJ_NUM = 10
+BG_SIZE = 1024  # background images are scaled to fit this size
+LOAD_CHUNK_TIME = 0.01  # seconds spent building buttons per event loop turn when loading
+
+#### selection sync vars
+SYNC_LATENCY = 10  # ms to wait for more selection changes before syncing the picker
+
+#### autosave vars
+AUTOSAVE_INTERVAL = 0  # seconds between autosaves of the modified tabs, 0 turns autosave off
+AUTOSAVE_DIR = os.path.join(os.path.expanduser('~'), 'nuPicker', 'autosave')
+
+#### file vars
+DEFAULT_IMAGE_FORMAT = ''  # background format of new layouts, '' keeps the image data as is, or 'png', 'jpg', 'webp'
+DEFAULT_IMAGE_QUALITY = 90  # jpg and webp quality, 0 to 100
+DEFAULT_COMPRESSION = ''  # button payload compression of new layouts, '', 'zlib' or 'lzma'
+
+#### library vars
+LIBRARY_INDEX_PATH = os.path.join(os.path.expanduser('~'), 'nuPicker', 'library_index.json')
 
 ##################################################
 #### undo classes
@@ -165,11 +218,13 @@ class CommandDeleteButton(QtWidgets.QUndoCommand):
         for button in self.buttons:
             self.parent.buttons.remove(button)
             self.parent.scene.removeItem(button)
+            self.parent.unwatchButton(button)
 
     def undo(self):
         for button in self.buttons:
             self.parent.buttons.append(button)
             self.parent.scene.addItem(button)
+            self.parent.watchButton(button)
 
 class CommandCreateCmdButton(QtWidgets.QUndoCommand):
     '''
@@ -183,18 +238,20 @@ class CommandCreateCmdButton(QtWidgets.QUndoCommand):
         self.opacity = opacity
         self.color = color
         self.button = NuPickerCommandButton()
+        self.button.cacheScale = parent.cacheScale
         self.cmd = ''
 
     def redo(self):
-        self.parent.buttons.append(self.button)
-        self.parent.scene.addItem(self.button)
-
+        # set the look up before adding the button, so the scene indexes it once
         self.cmd = self.button.cmd
         self.button.setText(self.label)
         self.button.resize(self.size)
         self.button.setButtonOpacity(self.opacity)
         self.button.setColor(self.color, update=True)
 
+        self.parent.buttons.append(self.button)
+        self.parent.scene.addItem(self.button)
+
     def undo(self):
         self.parent.buttons.remove(self.button) 
         self.parent.scene.removeItem(self.button)
@@ -212,12 +269,11 @@ class CommandCreateCmdButtonAt(QtWidgets.QUndoCommand):
         self.opacity = opacity
         self.color = color
         self.button = NuPickerCommandButton()
+        self.button.cacheScale = parent.cacheScale
         self.cmd = ''
 
     def redo(self):
-        self.parent.buttons.append(self.button)
-        self.parent.scene.addItem(self.button)
-
+        # set the look up before adding the button, so the scene indexes it once
         self.cmd = self.button.cmd
         self.button.setText(self.label)
         self.button.resize(self.size)
@@ -225,6 +281,9 @@ class CommandCreateCmdButtonAt(QtWidgets.QUndoCommand):
         self.button.setColor(self.color, update=True)
         self.button.setPos(self.pos)
 
+        self.parent.buttons.append(self.button)
+        self.parent.scene.addItem(self.button)
+
     def undo(self):
         self.parent.buttons.remove(self.button) 
         self.parent.scene.removeItem(self.button)
@@ -241,21 +300,25 @@ class CommandCreateButton(QtWidgets.QUndoCommand):
         self.opacity = opacity
         self.color = color
         self.button = NuPickerButton()
+        self.button.cacheScale = parent.cacheScale
         self.objs = []
 
     def redo(self):
-        self.parent.buttons.append(self.button)
-        self.parent.scene.addItem(self.button)
-
+        # set the look up before adding the button, so the scene indexes it once
         self.objs = self.button.objs
         self.button.setText(self.label)
         self.button.resize(self.size)
         self.button.setButtonOpacity(self.opacity)
         self.button.setColor(self.color, update=True)
 
+        self.parent.buttons.append(self.button)
+        self.parent.scene.addItem(self.button)
+        self.parent.watchButton(self.button)
+
     def undo(self):
         self.parent.buttons.remove(self.button) 
         self.parent.scene.removeItem(self.button)
+        self.parent.unwatchButton(self.button)
 
 class CommandCreateButtonAt(QtWidgets.QUndoCommand):
     '''
@@ -271,12 +334,11 @@ class CommandCreateButtonAt(QtWidgets.QUndoCommand):
         self.color = color
 
         self.button = NuPickerButton()
+        self.button.cacheScale = parent.cacheScale
         self.objs = []
 
     def redo(self):
-        self.parent.buttons.append(self.button)
-        self.parent.scene.addItem(self.button)
-
+        # set the look up before adding the button, so the scene indexes it once
         self.objs = self.button.objs
         self.button.setText(self.label)
         self.button.resize(self.size)
@@ -284,62 +346,97 @@ class CommandCreateButtonAt(QtWidgets.QUndoCommand):
         self.button.setColor(self.color, update=True)
         self.button.setPos(self.pos)
 
+        self.parent.buttons.append(self.button)
+        self.parent.scene.addItem(self.button)
+        self.parent.watchButton(self.button)
+
     def undo(self):
         self.parent.buttons.remove(self.button) 
         self.parent.scene.removeItem(self.button)
+        self.parent.unwatchButton(self.button)
 
 #### button class
 class NuPickerButton(QtWidgets.QGraphicsRectItem):
     '''
     Button class.
+        bind: bind to the current Maya selection, off for buttons built from data
+        color: initial color, so the pen and brush are only made once
     '''
-    def __init__(self):
+    def __init__(self, bind=True, color=DEFAULT_COLOR):
         super(NuPickerButton, self).__init__()
         # initial vars
         self.objs = []
-        self.color = DEFAULT_COLOR
+        self.uuids = []  # UUID of each obj at bind time, empty for legacy bindings
+        self.color = color
         self.scaleX = 1.0
         self.scaleY = 1.0
+        self.toolTipDirty = False  # the tool tip is rebuilt when next hovered
 
-        self.text = QtWidgets.QGraphicsTextItem(parent=self)
-        # self.text.setScale(0.65223)
-        self.text.setTransform(QtGui.QTransform.fromTranslate(-1, -5.4))
-        self.text.setDefaultTextColor(black)
-        self.text.setFont(QtGui.QFont(FONT_NAME))
+        # label, drawn by paint
+        self.label = ''
+        self.staticLabel = None
+        self.labelRect = QtCore.QRectF()
+        self.textColor = black
 
         # init default appearance
         # rect
         rect = QtCore.QRectF(0, 0, DEFAULT_SIZE, DEFAULT_SIZE)
         self.setRect(rect)
 
-        # pen and brush
-        self.setPen(QtGui.QPen(self.color))
-        self.setBrush(QtGui.QBrush(self.color))
+        # pen, brush and text color
+        self.setColor(color, update=True)
 
         # flags - not movable, selectable, send geometry change signal
         self.setFlag(QtWidgets.QGraphicsItem.ItemIsMovable, False)
         self.setFlag(QtWidgets.QGraphicsItem.ItemIsSelectable, True)
         self.setFlag(QtWidgets.QGraphicsItem.ItemSendsGeometryChanges)
-        self.setCacheMode(QtWidgets.QGraphicsItem.DeviceCoordinateCache)
+
+        # cached at the zoom step of the layout, see NuPickerLayout.updateLod
+        self.cacheScale = 1.0
+        updateButtonCache(self)
 
         # set not selected
         self.setSelected(False)
 
         # bind to what user is currently selecting
-        self.bind()
+        if bind:
+            self.bind()
 
     def setText(self, text):
         # set the text
-        self.text.setPlainText(text)
-        currRect = self.boundingRect()
+        self.prepareGeometryChange()
+        self.label = text
+        self.staticLabel = staticLabel(text)
+        currRect = QtWidgets.QGraphicsRectItem.boundingRect(self)
         # currSRect = self.sceneBoundingRect()
 
         # if text is not empty string, set button bounding rect to match the text
         if text:
-            textRect = self.text.boundingRect()
-            self.setRect(currRect.x(), currRect.y(), textRect.width(), DEFAULT_SIZE)
+            textSize = labelSize(text)
+            self.labelRect = QtCore.QRectF(LABEL_POS, textSize)
+            self.setRect(currRect.x(), currRect.y(), textSize.width() + LABEL_MARGIN*2, DEFAULT_SIZE)
         else:
+            self.labelRect = QtCore.QRectF()
             self.setRect(currRect.x(), currRect.y(), DEFAULT_SIZE, DEFAULT_SIZE)
+        updateButtonCache(self)
+
+    def boundingRect(self):
+        # the label may stick out of the rect a little
+        rect = super(NuPickerButton, self).boundingRect()
+        if self.label:
+            rect = rect.united(self.labelRect)
+        return rect
+
+    def paint(self, painter, option, widget=None):
+        detail = buttonDetail(self)
+        if detail == LOD_FLAT:
+            paintFlat(self, painter)
+            return
+        super(NuPickerButton, self).paint(painter, option, widget)
+        if self.label and detail == LOD_FULL:
+            painter.setFont(buttonFont())
+            painter.setPen(self.textColor)
+            painter.drawStaticText(self.labelRect.topLeft(), self.staticLabel)
 
     def resize(self, value):
         vx, vy = float('%.1f' %value[0]), float('%.1f' %value[1])
@@ -352,6 +449,7 @@ class NuPickerButton(QtWidgets.QGraphicsRectItem):
         # self.scale(fx, fy)
         currRect = self.boundingRect()
         self.setTransform(QtGui.QTransform.fromScale(fx, fy), True)
+        updateButtonCache(self)
         # x = currRect.width()*0.5
         # y = currRect.height()*0.5
         # self.setTransform(QtGui.QTransform().translate(x, y).scale(fx, fy).translate(-x, -y), True)
@@ -361,21 +459,38 @@ class NuPickerButton(QtWidgets.QGraphicsRectItem):
 
     def bind(self):
         self.objs = []
-        sels = pm.selected()
-        for sel in sels:
-            fp = sel.fullPath()[1:]  # remove | at the beginning
-            if sel.isReferenced() == True:
-                ns = sel.namespace()
+        self.uuids = []
+        for fullPath, ns, isReferenced, uuid in backend.selectedDagNodes():
+            fp = fullPath[1:]  # remove | at the beginning
+            if isReferenced == True:
                 fpRef = '|'.join([p for p in fp.split('|') if p.startswith(ns)])
                 fpNs = fpRef.replace(ns, '')
                 self.objs.append(fpNs)
             else:
                 self.objs.append(fp)
+            self.uuids.append(uuid)
 
         # set the tool tip to objects the button is bounded to      
         self.setButtonToolTip()
 
+    def setup(self, label, size, opacity, pos):
+        '''
+        Set the whole look of a new button before it is added to a scene.
+        '''
+        self.setText(label)
+        self.resize(size)
+        self.setOpacity(opacity)
+        self.setPos(pos[0], pos[1])
+
     def setButtonToolTip(self):
+        # only flag it, listing the objects of thousands of buttons is wasted
+        # on load when most are never hovered
+        self.toolTipDirty = True
+
+    def ensureToolTip(self):
+        if not self.toolTipDirty:
+            return
+        self.toolTipDirty = False
         tooltip = ''
         if self.objs:
             allObjsSn = [obj.split('|')[-1] for obj in self.objs]
@@ -399,9 +514,9 @@ class NuPickerButton(QtWidgets.QGraphicsRectItem):
             self.setPen(QtGui.QPen(self.color))
             v = self.color.value()
             if v <= 80:  # the button is dark, use white letters
-                self.text.setDefaultTextColor(white)
+                self.textColor = white
             else:  # the button is light, use black letters
-                self.text.setDefaultTextColor(black)
+                self.textColor = black
 
 
     def highlight(self):
@@ -416,48 +531,75 @@ class NuPickerCommandButton(QtWidgets.QGraphicsEllipseItem):
     '''
     Command Button class.
     '''
-    def __init__(self):
+    def __init__(self, color=DEFAULT_COLOR):
         super(NuPickerCommandButton, self).__init__()
         # initial vars
         self.cmd = ''
         self.language = 'mel'
-        self.color = DEFAULT_COLOR
+        self.color = color
         self.scaleX = 1.0
         self.scaleY = 1.0
+        self.toolTipDirty = False  # the tool tip is rebuilt when next hovered
 
-        self.text = QtWidgets.QGraphicsTextItem(parent=self)
-        self.text.setScale(0.65223)
-        self.text.setDefaultTextColor(black)
-        self.text.setFont(QtGui.QFont(FONT_NAME))
+        # label, drawn by paint
+        self.label = ''
+        self.staticLabel = None
+        self.labelRect = QtCore.QRectF()
+        self.textColor = black
 
         # init default appearance
         # rect
         rect = QtCore.QRectF(0, 0, DEFAULT_SIZE, DEFAULT_SIZE)
         self.setRect(rect)
 
-        # pen and brush
-        self.setPen(QtGui.QPen(self.color))
-        self.setBrush(QtGui.QBrush(self.color))
+        # pen, brush and text color
+        self.setColor(color, update=True)
 
         # flags - not movable, selectable, send geometry change signal
         self.setFlag(QtWidgets.QGraphicsItem.ItemIsMovable, False)
         self.setFlag(QtWidgets.QGraphicsItem.ItemIsSelectable, True)
         self.setFlag(QtWidgets.QGraphicsItem.ItemSendsGeometryChanges)
-        self.setCacheMode(QtWidgets.QGraphicsItem.DeviceCoordinateCache)
+
+        # cached at the zoom step of the layout, see NuPickerLayout.updateLod
+        self.cacheScale = 1.0
+        updateButtonCache(self)
 
         # set not selected
         self.setSelected(False)
 
     def setText(self, text):
         # set the text
-        self.text.setPlainText(text)
-        currRect = self.boundingRect()
+        self.prepareGeometryChange()
+        self.label = text
+        self.staticLabel = staticLabel(text)
+        currRect = QtWidgets.QGraphicsEllipseItem.boundingRect(self)
         # if text is not empty string, set button bounding rect to match the text
         if text:
-            textRect = self.text.boundingRect()
-            self.setRect(currRect.x(), currRect.y(), textRect.width()*0.65223, textRect.height()*0.65223)
+            textSize = labelSize(text)
+            self.labelRect = QtCore.QRectF(LABEL_MARGIN*CMD_LABEL_SCALE, LABEL_MARGIN*CMD_LABEL_SCALE,
+                                        textSize.width()*CMD_LABEL_SCALE, textSize.height()*CMD_LABEL_SCALE)
+            self.setRect(currRect.x(), currRect.y(),
+                        (textSize.width() + LABEL_MARGIN*2)*CMD_LABEL_SCALE,
+                        (textSize.height() + LABEL_MARGIN*2)*CMD_LABEL_SCALE)
         else:
+            self.labelRect = QtCore.QRectF()
             self.setRect(currRect.x(), currRect.y(), DEFAULT_SIZE, DEFAULT_SIZE)
+        updateButtonCache(self)
+
+    def paint(self, painter, option, widget=None):
+        detail = buttonDetail(self)
+        if detail == LOD_FLAT:
+            paintFlat(self, painter)
+            return
+        super(NuPickerCommandButton, self).paint(painter, option, widget)
+        if self.label and detail == LOD_FULL:
+            # the label is drawn smaller, inside the ellipse
+            painter.save()
+            painter.scale(CMD_LABEL_SCALE, CMD_LABEL_SCALE)
+            painter.setFont(buttonFont())
+            painter.setPen(self.textColor)
+            painter.drawStaticText(QtCore.QPointF(LABEL_MARGIN, LABEL_MARGIN), self.staticLabel)
+            painter.restore()
 
     def resize(self, value):
         vx, vy = float('%.1f' %value[0]), float('%.1f' %value[1])
@@ -469,10 +611,28 @@ class NuPickerCommandButton(QtWidgets.QGraphicsEllipseItem):
         self.scaleY = float('%.1f' %vy)
         # self.scale(fx, fy)
         self.setTransform(QtGui.QTransform.fromScale(fx, fy), True)
+        updateButtonCache(self)
 
     def setButtonOpacity(self, value):
         self.setOpacity(value)
 
+    def setup(self, label, size, opacity, pos):
+        '''
+        Set the whole look of a new button before it is added to a scene.
+        '''
+        self.setText(label)
+        self.resize(size)
+        self.setOpacity(opacity)
+        self.setPos(pos[0], pos[1])
+
+    def setButtonToolTip(self):
+        self.toolTipDirty = True
+
+    def ensureToolTip(self):
+        if self.toolTipDirty:
+            self.toolTipDirty = False
+            self.setToolTip(self.cmd)
+
     def showCmdDialog(self):
         # create the dialog
         cmdDialog = cmdDialogUi()
@@ -542,7 +702,7 @@ class NuPickerCommandButton(QtWidgets.QGraphicsEllipseItem):
                 newStr = '{}{}{}'.format(q, strNoQ, q)
                 cmd = cmd.replace(string, newStr)
             self.cmd = cmd
-        self.setToolTip(self.cmd)
+        self.setButtonToolTip()
 
     def itemChange(self, change, value):
         if change == QtWidgets.QGraphicsItem.ItemSelectedHasChanged:
@@ -556,9 +716,9 @@ class NuPickerCommandButton(QtWidgets.QGraphicsEllipseItem):
             self.setPen(QtGui.QPen(self.color))
             v = self.color.value()
             if v <= 128:  # the button is dark
-                self.text.setDefaultTextColor(white)
+                self.textColor = white
             else:
-                self.text.setDefaultTextColor(black)
+                self.textColor = black
 
     def highlight(self):
         if self.isSelected() == True:
@@ -595,14 +755,33 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
         # vars
         self.namespace = ''
         self.buttons = []
+        self.selectionSync = sync.SelectionSync()  # watched buttons, kept up to date by the button commands
+        self.commands = command.CommandCache()  # compiled command button code, run in Maya's __main__
+        self.streamButtons = []  # button data still to build when loading, the next one last
+        self.streamTotal = 0
+        self.streamTimer = QtCore.QTimer(self)
+        self.streamTimer.timeout.connect(self.streamChunk)
+        self.indexSuspended = 0  # nested suspendIndex calls, the scene is not indexed while above 0
+        self.cacheScale = 1.0  # zoom step the buttons are cached at, None past the last one
+        self.imageFormat = DEFAULT_IMAGE_FORMAT  # save options of the layout file
+        self.imageQuality = DEFAULT_IMAGE_QUALITY
+        self.compression = DEFAULT_COMPRESSION
+        self.revision = 0  # bumped by every change to the layout
+        self.autosavedRevision = 0  # revision written by the last autosave that succeeded
+        self.autosavingRevision = None  # revision of the autosave being written
+        self.bgTask = None  # background image being decoded
+        self.bgBytes = None  # encoded background image, saved as is
+        self.bgEncoded = None  # (bgBytes, format, quality, data) of the last background re-encoded by a save
         
         #### qt object vars
         # the undo stack object
         self.undoStack = QtWidgets.QUndoStack(self)
         self.undoStack.setUndoLimit(UNDO_LIMIT)
+        self.undoStack.indexChanged.connect(self.markModified)
 
         # graphic scene object
         self.scene = QtWidgets.QGraphicsScene()
+        self.scene.viewZoom = 1.0  # zoom of the view, the buttons choose their detail from it
 
         # setting up pixmap item for background image
         self.pixmapItem = QtWidgets.QGraphicsPixmapItem()
@@ -612,6 +791,9 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
         # add pixmap item to scene
         self.scene.addItem(self.pixmapItem)
 
+        # the button caches are drawn scaled between zoom steps
+        self.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+
         # rubber band object
         self.rubberband = QtWidgets.QRubberBand(QtWidgets.QRubberBand.Rectangle, self)
         
@@ -633,7 +815,29 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
         # self.scene.selectionChanged.connect(self.buttonSelectionChanged)
 
     def closeEvent(self, event):
-        self.app.killJob()
+        self.cancelStream()
+        self.cancelBackground()
+        self.selectionSync.clear()
+        self.commands.clear()
+
+    def watchButton(self, button):
+        if isinstance(button, NuPickerButton):
+            # the next sync only reports changes, show the state of the new binding now:
+            # lit if already matched, dark if it was lit for objects it is not bound to anymore
+            matched = self.selectionSync.watch(button, button.objs, button.uuids)
+            if matched != button.isSelected():
+                displayOnly = self.displayOnly
+                self.displayOnly = True
+                button.setSelected(matched)
+                self.displayOnly = displayOnly
+
+    def unwatchButton(self, button):
+        self.selectionSync.unwatch(button)
+        self.commands.invalidate(button)
+
+    def setNamespace(self, namespace):
+        self.namespace = namespace
+        self.selectionSync.setNamespace(namespace)
 
     def undoIt(self):
         self.undoStack.undo()
@@ -720,6 +924,7 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
 
                 if zoomed > 0.168261435398:
                     self.scale(factor, factor)          
+                    self.updateLod()
                 else:
                     self.viewCenter = self.scene.sceneRect().center()
 
@@ -737,21 +942,24 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
         if event.button() == QtCore.Qt.LeftButton:
             mods = QtWidgets.QApplication.keyboardModifiers()
             if not mods & QtCore.Qt.AltModifier:
+                # the Maya selection is changed the same way as the picker one
+                mode = backend.SELECT_REPLACE
+                changed = []  # buttons added or subtracted with shift or ctrl
                 # its a single click 
                 if self.clickPos == event.pos():
                     item = self.itemAt(self.clickPos)
                     if item:
                         button = None
-                        if item in self.buttons:  # selection is the button geometry itself(QGraphicsRectItem)
+                        if item in self.buttons:  # the label is drawn by the button, no child item to check
                             button = item
-                        elif item.parentItem() in self.buttons:  # selection is the label(QGraphicsTextItem)
-                            button = item.parentItem()
 
                         if button:
                             if mods & QtCore.Qt.ControlModifier:  # if user pressed ctrl, subtract selection
                                 button.setSelected(False)
+                                mode, changed = backend.SELECT_DESELECT, [button]
                             elif mods & QtCore.Qt.ShiftModifier:  # if user pressed shift, add selection
                                 button.setSelected(True)
+                                mode, changed = backend.SELECT_ADD, [button]
                             elif not mods:  # no modifier key pressed
                                 self.scene.clearSelection()
                                 button.setSelected(True)
@@ -761,7 +969,7 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
                     else:
                         self.scene.clearSelection()
 
-                    self.buttonSelectionChanged()
+                    self.buttonSelectionChanged(mode, changed)
                 else:  # its a rubber band drag
                     croppedItems = self.scene.items(self.mapToScene(self.rubberband.geometry()))
                     painterPath = QtGui.QPainterPath()
@@ -769,6 +977,7 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
                     croppedItems = [c for c in croppedItems if c in self.buttons]
                     if croppedItems:
                         if mods & QtCore.Qt.ControlModifier:  # if user pressed ctrl, subtract selection
+                            mode, changed = backend.SELECT_DESELECT, list(croppedItems)
                             painterPath = QtGui.QPainterPath()
                             oldPainterPath = QtGui.QPainterPath()
 
@@ -786,6 +995,7 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
                             painterPath = oldPainterPath.subtracted(painterPath)
 
                         elif mods & QtCore.Qt.ShiftModifier:  # if user pressed shift, add selection
+                            mode, changed = backend.SELECT_ADD, list(croppedItems)
                             selButtons = self.scene.selectedItems()
                             croppedItems.extend(selButtons)
                             for button in croppedItems:
@@ -797,7 +1007,7 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
                     else:
                         self.scene.clearSelection()
 
-                    self.buttonSelectionChanged()
+                    self.buttonSelectionChanged(mode, changed)
 
             else:  # alt pressed, done moving button
                 selButtons = self.scene.selectedItems()
@@ -819,6 +1029,39 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
     
         QtWidgets.QGraphicsView.mouseReleaseEvent(self, event)
 
+    def viewportEvent(self, event):
+        # tool tips are built when first needed, before the scene looks them up
+        if event.type() == QtCore.QEvent.ToolTip:
+            for item in self.items(event.pos()):
+                if isinstance(item, (NuPickerButton, NuPickerCommandButton)):
+                    item.ensureToolTip()
+        return super(NuPickerLayout, self).viewportEvent(event)
+
+    def updateLod(self):
+        '''
+        Cache the buttons again when the zoom moves to another of the CACHE_SCALES
+        steps, in between the caches are only drawn scaled. Only the buttons
+        whose detail changed at the new zoom are drawn again within a step.
+        '''
+        zoom = self.transform().m11()
+        prevZoom, self.scene.viewZoom = self.scene.viewZoom, zoom
+        scale = None
+        for step in CACHE_SCALES:
+            if step >= zoom:
+                scale = step
+                break
+        if scale == self.cacheScale:
+            low, high = min(prevZoom, zoom), max(prevZoom, zoom)
+            if low != high:
+                for button in self.buttons:
+                    if low < button.flatZoom <= high or low < button.labelZoom <= high:
+                        button.update()
+            return
+        self.cacheScale = scale
+        for button in self.buttons:
+            button.cacheScale = scale
+            updateButtonCache(button)
+
     def wheelEvent(self, event):
         scrollFactor = event.delta()/120.0  # -1.0 or 1.0  - only directions
         factor = 1.0 + ZOOM_STEP
@@ -829,6 +1072,7 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
         zoomed = self.transform().m11() * factor
         if zoomed > 0.168261435398:
             self.scale(factor, factor)
+            self.updateLod()
         else:
             self.viewCenter = self.scene.sceneRect().center()
 
@@ -848,19 +1092,19 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
         button = None
         if item in self.buttons:
             button = item
-        elif item.parentItem() in self.buttons:
-            button = item.parentItem()
 
         if button:
             button.bind()
-            self.app.createScriptJob(self)
+            self.commands.invalidate(button)
+            self.watchButton(button)
+            self.markModified()
 
     def renameButton(self, text=''):
         selButtons = self.scene.selectedItems()
         if selButtons:
             oldNames = []
             for button in selButtons:
-                oldNames.append(str(button.text.toPlainText()))
+                oldNames.append(button.label)
             # add to undostack
             command = CommandRenameButton(selButtons, oldNames, text)
             self.undoStack.push(command)
@@ -978,8 +1222,6 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
         self.scene.clearSelection()
         command.button.setSelected(True)
 
-        self.app.createScriptJob(self)
-
     def newCmdButtonAt(self, pos):
         label, size, opacity, color = self.getButtonConfigs()
         
@@ -1010,8 +1252,6 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
         button = None
         if item in self.buttons:
             button = item
-        elif item.parentItem() in self.buttons:
-            button = item.parentItem()
 
         if button:
             selButtons = self.scene.selectedItems()
@@ -1033,24 +1273,64 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
         color = self.parentUi.defaultButtonColor
         return label, size, opacity, color
 
+    def markModified(self, *args):
+        self.revision += 1
+
+    def isModified(self):
+        '''
+        Return True if the layout changed since the last autosave.
+        '''
+        return self.revision != self.autosavedRevision
+
     def setBackground(self, path=None, data=None):
-        pixmap = None
-        # create new pixmap item with image from the path
+        self.markModified()
+        # image from the path or from byte data, the encoded image is kept to be saved as is
         if path:
             if not os.path.exists(path): 
                 return
-            pixmap = QtGui.QPixmap(path)
-        # new pixmap from byte data
-        elif data:
-            ba = QtCore.QByteArray(data)
-            pixmap = QtGui.QPixmap()
-            pixmap.loadFromData(ba, "PNG")
-
-        if not pixmap:
+        elif not data:
+            return
+
+        # shared with the other layouts using the same image, or decoded
+        # on a worker thread and the buttons show over a placeholder until it is ready
+        self.cancelBackground()
+        pixmap, data, task = images.loadBackground(self.backgroundDecoded, path=path, data=data, size=BG_SIZE)
+        if pixmap:
+            self.applyBackground(pixmap)
+            self.bgBytes = data
             return
+        if self.pixmapItem.pixmap().isNull():
+            self.applyBackground(placeholderBackground())
+        self.bgTask = task
 
-        # scale to 1024
-        pixmap = pixmap.scaled(1024, 1024, QtCore.Qt.KeepAspectRatio)
+    def backgroundDecoded(self, task, pixmap):
+        # a newer background replaced this one
+        if task is not self.bgTask:
+            return
+        self.bgTask = None
+        if not pixmap.isNull():
+            self.applyBackground(pixmap)
+            self.bgBytes = task.data
+
+    def finishBackground(self):
+        '''
+        Wait for the background being decoded, if any, and set it right away.
+        '''
+        task = self.bgTask
+        if task:
+            self.backgroundDecoded(task, task.wait())
+
+    def cancelBackground(self):
+        if self.bgTask:
+            self.bgTask.cancel(self.backgroundDecoded)
+            self.bgTask = None
+
+    def isDecoding(self):
+        return self.bgTask is not None
+
+    def applyBackground(self, pixmap):
+        # scale to BG_SIZE, a pixmap already at that size is returned as is
+        pixmap = pixmap.scaled(BG_SIZE, BG_SIZE, QtCore.Qt.KeepAspectRatio)
 
         # set scene rect to 3 times the image size
         self.scene.setSceneRect(0, 0, pixmap.width()*3, pixmap.height()*3)
@@ -1081,9 +1361,78 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
         
         # frame image to center of the view
         self.fitInView(self.pixmapItem, QtCore.Qt.KeepAspectRatio)
+        self.updateLod()
         self.viewCenter = sceneCenter
 
-    def createButtonFromData(self, data):
+    def streamLoad(self, buttons):
+        '''
+        Build the buttons from their data a chunk at a time from the event loop,
+        the ones in view first, so Maya stays responsive on big layouts.
+        '''
+        self.cancelStream()
+        viewRect = self.mapToScene(self.viewport().rect()).boundingRect()
+        center = viewRect.center()
+        def order(data):
+            x, y = data[-1]
+            inView = viewRect.contains(x, y)
+            return (not inView, 0 if inView else (x - center.x())**2 + (y - center.y())**2)
+
+        self.streamButtons = sorted(buttons, key=order, reverse=True)
+        self.streamTotal = len(buttons)
+        # the scene index is rebuilt once all the buttons are in
+        self.suspendIndex()
+        # small layouts are done in this first chunk
+        self.streamChunk()
+        if self.streamButtons:
+            self.streamTimer.start(0)
+
+    def streamChunk(self):
+        end = time.time() + LOAD_CHUNK_TIME
+        pending = self.streamButtons
+        while pending and time.time() < end:
+            self.createButtonFromData(data=pending.pop())
+        if not pending:
+            self.streamFinished()
+        self.app.updateLoadProgress(self)
+
+    def streamFinished(self):
+        self.streamTimer.stop()
+        self.streamTotal = 0
+        self.resumeIndex()
+        self.autosavedRevision = self.revision
+
+    def isStreaming(self):
+        return bool(self.streamButtons)
+
+    def finishStream(self):
+        '''
+        Build every button still waiting to be built, right away.
+        '''
+        if not self.streamButtons:
+            return
+        pending, self.streamButtons = self.streamButtons, []
+        self.createButtonsFromData(reversed(pending))
+        self.streamFinished()
+        self.app.updateLoadProgress(self)
+
+    def cancelStream(self):
+        if not self.streamButtons:
+            return
+        built = self.streamTotal - len(self.streamButtons)
+        print('Load cancelled, {} of {} buttons built: {}'.format(built, self.streamTotal, self.loadedFrom))
+        self.streamButtons = []
+        self.streamTimer.stop()
+        self.streamTotal = 0
+        self.resumeIndex()
+        # saving the partial layout over its file would lose the missing buttons
+        self.loadedFrom = ''
+        self.app.updateLoadProgress(self)
+
+    def buildButtonFromData(self, data):
+        '''
+        Make a button from its data, not added to the scene yet.
+        Nothing is asked to Maya, the button is bound to the objects of the data.
+        '''
         # unpack the data
         label = data[0]
         sizeX, sizeY = data[1][0], data[1][1]
@@ -1091,16 +1440,16 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
         color = data[3]
         qcolor = QtGui.QColor(color[0], color[1], color[2])
         exe = data[4]
-        pos = data[5]
+        uuids = data[5] if len(data) > 6 else []  # files saved before UUID binding
+        pos = data[-1]
 
         # see if its a normal button or a cmd button
         if isinstance(exe, list):  # its normal button
-            button = NuPickerButton()
+            button = NuPickerButton(bind=False, color=qcolor)
             button.objs = exe
-            button.setButtonToolTip()
-            # button.setToolTip('\n'.join([obj.split('|')[-1] for obj in exe]))
+            button.uuids = uuids
         else:
-            button = NuPickerCommandButton()
+            button = NuPickerCommandButton(color=qcolor)
             # split out language
             lang = '<mel>'
             if not exe.startswith(lang):
@@ -1110,62 +1459,96 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
             exe = exe.split(lang)[-1]
 
             button.cmd = exe
-            button.setToolTip(exe)
+        button.setButtonToolTip()
+        button.cacheScale = self.cacheScale
+
+        # setup the new button while it is off the scene
+        button.setup(label, [sizeX, sizeY], opacity, pos)
+        return button
 
+    def createButtonFromData(self, data):
+        button = self.buildButtonFromData(data)
         self.buttons.append(button)
         self.scene.addItem(button)
-
-        # setup the new button
-        button.setText(text=label)
-        button.resize(value=[sizeX, sizeY])
-        button.setButtonOpacity(value=opacity)
-        button.setColor(color=qcolor, update=True)
-
-        button.setPos(pos[0], pos[1])
-
+        self.watchButton(button)
         return button
 
-    def buttonSelectionChanged(self):
+    def createButtonsFromData(self, datas):
+        '''
+        Create many buttons at once, for loaded, pasted or generated layouts.
+        The scene index is suspended while they are added and rebuilt once after.
+        '''
+        self.suspendIndex()
+        try:
+            return [self.createButtonFromData(data) for data in datas]
+        finally:
+            self.resumeIndex()
+
+    def suspendIndex(self):
+        '''
+        Stop indexing the scene items, adding items is then only appending them.
+        Calls nest, each one needs its resumeIndex.
+        '''
+        if not self.indexSuspended:
+            self.scene.setItemIndexMethod(QtWidgets.QGraphicsScene.NoIndex)
+        self.indexSuspended += 1
+
+    def resumeIndex(self):
+        if not self.indexSuspended:
+            return
+        self.indexSuspended -= 1
+        if not self.indexSuspended:
+            # rebuilds the BSP tree of every item in one go
+            self.scene.setItemIndexMethod(QtWidgets.QGraphicsScene.BspTreeIndex)
+
+    def buttonSelectionChanged(self, mode=backend.SELECT_REPLACE, changed=()):
+        '''
+        Select the objects of the selected buttons in Maya, or run the selected
+        command buttons. With SELECT_ADD or SELECT_DESELECT only the objects of
+        the changed buttons are added to or removed from the Maya selection.
+        '''
         text, scaleTxt, opacityTxt = '', '', ''
         
         if self.displayOnly == False:
             texts, scales, opacities = set(), set(), set()
             selButtons = self.scene.selectedItems()
 
-            cmd = ''
-            btnMelCmd = ''
-            btnPyCmd = ''
+            melButtons = []
+            pyButtons = []
             objNames = set()
             cmdButtons = []
+            pickButtons = [b for b in selButtons if isinstance(b, NuPickerButton)]
+            # the subtracted buttons are not selected anymore, their objects are still needed
+            resolveButtons = pickButtons + [b for b in changed if isinstance(b, NuPickerButton) and b not in pickButtons]
+            pickObjs = []  # (path, uuid) of every object bound to the buttons
+            for button in resolveButtons:
+                for i, obj in enumerate(button.objs):
+                    uuid = button.uuids[i] if i < len(button.uuids) else None
+                    pickObjs.append((obj, uuid))
+
+            # resolve the objects of all the buttons at once
+            nodes = iter(self.app.resolver.resolveMany(self.namespace, pickObjs))
+            buttonNodes = {}  # button: resolved nodes
+            for button in resolveButtons:
+                buttonNodes[button] = [node for node in [next(nodes) for obj in button.objs] if node]
+
             if selButtons:
                 for button in selButtons:
-                    texts.add(str(button.text.toPlainText()))  # add label to the set
+                    texts.add(button.label)  # add label to the set
                     scales.add((button.scaleX, button.scaleY))
                     opacities.add(button.opacity())
-                    ns = '|{}'.format(self.namespace)
                     if isinstance(button, NuPickerButton):  # it's a button
-                        setSel = False
-                        if button.objs:
-                            for obj in button.objs:
-                                name = '{}{}'.format(self.namespace, obj.replace('|', ns))
-                                shortName = name.split('|')[-1]
-                                if pm.objExists(name) == True:
-                                    objNames.add(name)
-                                    setSel = True
-                                elif len(mc.ls(shortName)) == 1:
-                                    objNames.add(shortName)
-                                    setSel = True
+                        objNames.update(buttonNodes[button])
                         self.displayOnly = True
-                        button.setSelected(setSel)
+                        button.setSelected(bool(buttonNodes[button]))
                         self.displayOnly = False
                     elif isinstance(button, NuPickerCommandButton):  # it's a command button
                         cmdButtons.append(button)
                         if button.cmd:
-                            nsCmd = button.cmd.replace('<ns>', self.namespace)
                             if button.language == 'mel':
-                                btnMelCmd += nsCmd
+                                melButtons.append(button)
                             else:
-                                btnPyCmd  += nsCmd
+                                pyButtons.append(button)
 
                 if len(texts) > 1:
                     text = MULTIPLE_VALUE_DISPLAY
@@ -1186,32 +1569,34 @@ class NuPickerLayout(QtWidgets.QGraphicsView):
             
 
             # then execute selection
-            if objNames:
-                objs = list(objNames)
-                cmd = 'select -r {};'.format(' '.join(objs))
-            else:
-                cmd = 'select -cl;'
+            objs = list(objNames)
+            if not objs:
                 text, scaleTxt, opacityTxt = '', '', ''
 
         
-            # execute command button command
+            # execute command button command, compiled once per namespace
             # MEL
-            if btnMelCmd or btnPyCmd:
-                if btnMelCmd:
+            if melButtons or pyButtons:
+                for button in melButtons:
                     try:
-                        mel.eval(btnMelCmd)
+                        self.commands.run(button, self.namespace)
                     except Exception as e:
                         pass
                 # Python
-                if btnPyCmd:
+                for button in pyButtons:
                     try:
-                        pm.python(btnPyCmd)
+                        self.commands.run(button, self.namespace)
                     except Exception as e:
                         print(e)
 
+            elif mode == backend.SELECT_REPLACE:
+                backend.selectNodes(objs, mode=mode)
             else:
-                # execute the select command
-                mel.eval(cmd)
+                # shift and ctrl keep the Maya selection the picker doesn't show
+                changedNames = set()
+                for button in changed:
+                    changedNames.update(buttonNodes.get(button, ()))
+                backend.selectNodes(list(changedNames), mode=mode)
 
             self.displayOnly = True
             for b in cmdButtons:
@@ -1237,6 +1622,186 @@ class cmdDialogUi(QtWidgets.QDialog, ui.Ui_cmd_dialog) :
             language = 'python'
         return [cmd, language]
 
+# layout file save options dialog
+class SaveOptionsUi(QtWidgets.QDialog):
+    '''
+    Background image format and button compression of a layout file.
+    Only the formats and compressions this Maya can write are listed.
+    '''
+    def __init__(self, parent, imageFormat, quality, compression):
+        super(SaveOptionsUi, self).__init__(parent)
+        self.setWindowTitle('Save options')
+
+        self.format_comboBox = QtWidgets.QComboBox(self)
+        self.format_comboBox.addItem('Keep as is', '')
+        for fmt in images.writableFormats():
+            self.format_comboBox.addItem(fmt.upper(), fmt)
+        self.quality_spinBox = QtWidgets.QSpinBox(self)
+        self.quality_spinBox.setRange(0, 100)
+        self.compression_comboBox = QtWidgets.QComboBox(self)
+        for name in npk.availableCompressions():
+            self.compression_comboBox.addItem(name or 'None', name)
+        buttonBox = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel, parent=self)
+
+        layout = QtWidgets.QFormLayout(self)
+        layout.addRow('Background image', self.format_comboBox)
+        layout.addRow('Image quality', self.quality_spinBox)
+        layout.addRow('Button compression', self.compression_comboBox)
+        layout.addRow(buttonBox)
+
+        self.format_comboBox.setCurrentIndex(max(0, self.format_comboBox.findData(imageFormat)))
+        self.quality_spinBox.setValue(quality)
+        self.compression_comboBox.setCurrentIndex(max(0, self.compression_comboBox.findData(compression)))
+        self.formatChanged()
+
+        self.format_comboBox.currentIndexChanged.connect(self.formatChanged)
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+
+    def formatChanged(self):
+        # png is lossless
+        self.quality_spinBox.setEnabled(self.format_comboBox.itemData(self.format_comboBox.currentIndex()) in ('jpg', 'webp'))
+
+    def getOptions(self):
+        return (self.format_comboBox.itemData(self.format_comboBox.currentIndex()),
+                self.quality_spinBox.value(),
+                self.compression_comboBox.itemData(self.compression_comboBox.currentIndex()))
+
+# library browser panel
+class LibraryBrowserUi(QtWidgets.QDockWidget):
+    '''
+    Thumbnails and summaries of the layout files of the library directory,
+    read from the index and refreshed by a scan on a worker thread.
+    Double click a file to open it.
+    '''
+    def __init__(self, parent, app):
+        super(LibraryBrowserUi, self).__init__('Library', parent)
+        self.setObjectName('nuPicker_libraryDock')
+        self.app = app
+        self.directory = ''
+        self.scanTask = None
+        self.items = {}  # path: QListWidgetItem
+
+        self.index = library.LibraryIndex(LIBRARY_INDEX_PATH)
+        self.index.load()
+
+        self.pool = tasks.TaskPool(1)
+
+        # widgets
+        widget = QtWidgets.QWidget(self)
+        layout = QtWidgets.QVBoxLayout(widget)
+        layout.setContentsMargins(2, 2, 2, 2)
+        headerLayout = QtWidgets.QHBoxLayout()
+        self.filter_lineEdit = QtWidgets.QLineEdit(widget)
+        self.filter_lineEdit.setPlaceholderText('Filter by name or namespace')
+        self.refresh_pushButton = QtWidgets.QPushButton('Rescan', widget)
+        headerLayout.addWidget(self.filter_lineEdit)
+        headerLayout.addWidget(self.refresh_pushButton)
+        layout.addLayout(headerLayout)
+
+        self.listWidget = QtWidgets.QListWidget(widget)
+        self.listWidget.setViewMode(QtWidgets.QListView.IconMode)
+        self.listWidget.setResizeMode(QtWidgets.QListView.Adjust)
+        self.listWidget.setMovement(QtWidgets.QListView.Static)
+        self.listWidget.setIconSize(QtCore.QSize(library.THUMBNAIL_SIZE, library.THUMBNAIL_SIZE))
+        self.listWidget.setUniformItemSizes(True)
+        self.listWidget.setSortingEnabled(True)
+        layout.addWidget(self.listWidget)
+
+        self.status_label = QtWidgets.QLabel(widget)
+        layout.addWidget(self.status_label)
+        self.setWidget(widget)
+
+        # connect
+        self.filter_lineEdit.textChanged.connect(self.applyFilter)
+        self.refresh_pushButton.clicked.connect(self.rescan)
+        self.listWidget.itemDoubleClicked.connect(self.openItem)
+
+    def setDirectory(self, directory):
+        directory = os.path.normpath(directory)
+        if directory == self.directory:
+            return
+        self.cancelScan()
+        self.directory = directory
+        self.listWidget.clear()
+        self.items = {}
+
+        # show what the index knows right away, then rescan
+        for path, entry in self.index.entriesIn(directory).items():
+            self.entryUpdated(path, entry)
+        self.rescan()
+
+    def rescan(self):
+        if not self.directory or not os.path.isdir(self.directory):
+            self.status_label.setText('Directory not found: {}'.format(self.directory))
+            return
+        self.cancelScan()
+        self.scanTask = library.ScanTask(self.index, self.directory)
+        self.scanTask.signals.entryUpdated.connect(self.entryUpdated)
+        self.scanTask.signals.entryRemoved.connect(self.entryRemoved)
+        self.scanTask.signals.finished.connect(self.scanFinished)
+        self.status_label.setText('Scanning {}...'.format(self.directory))
+        self.pool.start(self.scanTask)
+
+    def cancelScan(self):
+        if self.scanTask:
+            self.scanTask.cancel()
+            # not started yet, take it out of the queue, otherwise
+            # the scan returns at once on its cancelled flag
+            self.pool.tryTake(self.scanTask)
+            self.scanTask = None
+
+    def scanFinished(self, task):
+        if task is not self.scanTask:
+            return
+        self.scanTask = None
+        self.status_label.setText('{} files, {} read'.format(len(self.items), task.read))
+
+    def entryUpdated(self, path, entry):
+        item = self.items.get(path)
+        if item is None:
+            item = QtWidgets.QListWidgetItem()
+            item.setData(QtCore.Qt.UserRole, path)
+            self.items[path] = item
+            self.listWidget.addItem(item)
+
+        fileName = os.path.splitext(os.path.basename(path))[0]
+        item.setText(fileName)
+        item.setIcon(QtGui.QIcon(library.thumbnailPixmap(entry)))
+        if entry.get('error'):
+            tooltip = '{}\n{}'.format(path, entry['error'])
+        else:
+            tooltip = '{}\nName: {}\nButtons: {}\nCommands: {}\nNamespaces: {}'.format(path,
+                                                            entry['name'],
+                                                            entry['buttons'],
+                                                            entry['commands'],
+                                                            ', '.join(entry['namespaces']) or '-')
+        item.setToolTip(tooltip)
+        searchText = ' '.join([fileName, entry.get('name', '')] + entry.get('namespaces', []))
+        item.setData(QtCore.Qt.UserRole + 1, searchText.lower())
+        self.filterItem(item)
+
+    def entryRemoved(self, path):
+        item = self.items.pop(path, None)
+        if item:
+            self.listWidget.takeItem(self.listWidget.row(item))
+
+    def applyFilter(self):
+        for item in self.items.values():
+            self.filterItem(item)
+
+    def filterItem(self, item):
+        text = self.filter_lineEdit.text().lower()
+        item.setHidden(bool(text) and text not in item.data(QtCore.Qt.UserRole + 1))
+
+    def openItem(self, item):
+        self.app.load(path=item.data(QtCore.Qt.UserRole))
+
+    def closeEvent(self, event):
+        self.cancelScan()
+        super(LibraryBrowserUi, self).closeEvent(event)
+
 # the main dialog
 class NuPickerUi(QtWidgets.QMainWindow, ui.Ui_nuPicker_MainWindow):
     '''
@@ -1275,21 +1840,48 @@ class NuPickerUi(QtWidgets.QMainWindow, ui.Ui_nuPicker_MainWindow):
         self.colorDialog.setCustomColor(7, brown)
         self.colorDialog.setCustomColor(8, pink)
         self.colorDialog.setCustomColor(9, gray)
+
+        # library browser, the dock is built the first time it is shown
+        self.libraryBrowser = None
+        self.library_action = QtWidgets.QAction('Library...', self)
+        self.file_menu.insertAction(self.save_action, self.library_action)
+
+        # image format and compression of the current tab file
+        self.saveOptions_action = QtWidgets.QAction('Save options...', self)
+        self.file_menu.insertAction(self.save_action, self.saveOptions_action)
+
+        # progress of the current tab while its buttons are being built
+        self.load_progressBar = QtWidgets.QProgressBar(self)
+        self.loadCancel_pushButton = QtWidgets.QPushButton('Cancel', self)
+        self.statusBar().addPermanentWidget(self.load_progressBar, 1)
+        self.statusBar().addPermanentWidget(self.loadCancel_pushButton)
+        self.statusBar().hide()
     
     def quit(self):
         self.close()
 
     def closeEvent(self, event):
         self.app.killJob()
+        # a warm app only keeps the scene callbacks while hidden, to know it
+        # must be rebuilt, the resolver stops listening to every node change
+        self.app.resolver.killCallbacks()
+        if not self.app.keepAlive:
+            self.app.killSceneJobs()
+            self.app.autosaveTimer.stop()
+            self.app.saver.waitForDone()
+
 
-        
 #### application class
 class NuPicker(object):
     '''
     The main application class.
     '''
     # def __init__(self, parent=None, dock=None):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, startTime=None):
+        # startup timing, startTime can be given by the caller to include the imports
+        self.__startTime = startTime if startTime is not None else time.time()
+        self.startupTimes = []  # [(step, seconds since start), ...]
+
         # class vars
         self.__defaultScrollRollVis = QtCore.Qt.ScrollBarAlwaysOff
         self.__package_dir = os.path.dirname(__file__).replace('\\', '/')
@@ -1299,8 +1891,14 @@ class NuPicker(object):
         self.__app_icon_dir = '{}/ui/img/app_icon.png'.format(self.__package_dir)
         self.__refresh_icon_dir = '{}/ui/img/refresh_icon.png'.format(self.__package_dir)
 
-        self.__jobID = 0
+        self.__jobID = None
+        self.__sceneJobIDs = []
+        self.resolver = resolver.NameResolver()  # bound object -> node name cache, shared by all tabs
         self.__createScriptJob = True
+        self.__syncDirty = False
+        self.__startupLayout = None  # default tab waiting for its background
+        self.keepAlive = False  # warm start, the app stays alive hidden once closed
+        self.sceneChangedWhileHidden = False
 
         # directory var
         self.default_file_dir = DEFAULT_FILE_DIR
@@ -1310,6 +1908,7 @@ class NuPicker(object):
 
         # instance the main UI
         self.ui = NuPickerUi(parent, self)
+        self.markStartup('ui')
         
         # modify the UI
         # window icon
@@ -1336,6 +1935,9 @@ class NuPicker(object):
         self.ui.save_action.triggered.connect(self.save)
         self.ui.saveAs_action.triggered.connect(self.saveAs)
         self.ui.setDirectory_action.triggered.connect(self.setDirectory)
+        self.ui.library_action.triggered.connect(self.showLibrary)
+        self.ui.saveOptions_action.triggered.connect(self.showSaveOptions)
+        self.ui.loadCancel_pushButton.clicked.connect(self.cancelLoad)
         self.ui.quit_action.triggered.connect(self.quit)
 
         # edit
@@ -1382,6 +1984,23 @@ class NuPicker(object):
         self.timer.setInterval(200)
         self.timer.setSingleShot(True)
         self.timer.timeout.connect(self.setDefaultButtonColor)
+
+        # set timer for coalescing selection changes into a single sync
+        self.syncLatency = SYNC_LATENCY
+        self.syncTimer = QtCore.QTimer()
+        self.syncTimer.setSingleShot(True)
+        self.syncTimer.timeout.connect(self.flushSync)
+
+        # layouts are read and written on worker threads, autosave is off by default
+        self.saver = saver.Saver()
+        self.loader = loader.Loader()
+        self.loader.loaded.connect(self.layoutLoaded)
+        self.loader.failed.connect(self.layoutLoadFailed)
+        self.saver.saved.connect(self.layoutSaved)
+        self.saver.failed.connect(self.layoutSaveFailed)
+        self.autosaveTimer = QtCore.QTimer()
+        self.autosaveTimer.timeout.connect(self.autosave)
+        self.setAutosave(AUTOSAVE_INTERVAL)
         
         # tab widget
         self.ui.main_tabWidget.currentChanged.connect(self.tabChanged)
@@ -1389,13 +2008,50 @@ class NuPicker(object):
         self.ui.main_tabWidget.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
         self.ui.main_tabWidget.customContextMenuRequested.connect(self.tabRightClicked) 
 
-        # show all ui
+        # init default state, the default tab gets its background after the first paint
+        self.initDefault(background=False)
+        self.setDefaultButtonColor()
+
+        # show all ui, everything that queries Maya waits for the event loop
         self.ui.show()
+        self.markStartup('shown')
+        QtCore.QTimer.singleShot(0, self.finishStartup)
+
+    def finishStartup(self):
+        layout = self.__startupLayout
+        self.__startupLayout = None
+        if layout and self.ui.main_tabWidget.indexOf(layout) != -1:
+            layout.setBackground(path=self.__default_bg_dir)
+        self.refreshNamespace()
+        self.createSceneJobs()
+        self.markStartup('ready')
+        print(self.startupReport())
+
+    def reshow(self):
+        '''
+        Show a warm app again, tabs, backgrounds and undo stacks are kept as they were.
+        '''
+        self.__startTime = time.time()
+        self.startupTimes = []
+        self.ui.show()
+        self.ui.raise_()
+        self.ui.activateWindow()
+        self.markStartup('shown')
 
-        # init default state
-        self.initDefault()
+        # nodes, namespaces and selection may have changed while hidden
+        self.resolver.clear()
+        self.resolver.createCallbacks()
         self.refreshNamespace()
-        self.setDefaultButtonColor()
+        self.selectionChanged()
+        self.markStartup('ready')
+        print(self.startupReport())
+
+    def markStartup(self, step):
+        self.startupTimes.append((step, time.time() - self.__startTime))
+
+    def startupReport(self):
+        steps = ', '.join(['{} {:.1f}ms'.format(step, t*1000) for step, t in self.startupTimes])
+        return '{} startup: {}'.format(WINDOW_NAME, steps)
 
     def setDirectory(self):
         text, result = QtWidgets.QInputDialog.getText(self.ui, 
@@ -1409,9 +2065,48 @@ class NuPicker(object):
             path = str(text)
             if os.path.exists(os.path.normpath(path)):
                 self.default_file_dir = path
+                if self.ui.libraryBrowser:
+                    self.ui.libraryBrowser.setDirectory(path)
                 print('Directory set: {}'.format(path))
             else:
-                om.MGlobal.displayError('Path does not exist: {}'.format(path))
+                backend.displayError('Path does not exist: {}'.format(path))
+
+    def updateLoadProgress(self, layout=None):
+        currLayout = self.ui.main_tabWidget.currentWidget()
+        if layout is not None and layout is not currLayout:
+            return
+        statusBar = self.ui.statusBar()
+        if not currLayout or not currLayout.isStreaming():
+            statusBar.hide()
+            return
+        progressBar = self.ui.load_progressBar
+        progressBar.setRange(0, currLayout.streamTotal)
+        progressBar.setValue(currLayout.streamTotal - len(currLayout.streamButtons))
+        progressBar.setFormat('Loading buttons %v/%m')
+        statusBar.show()
+
+    def cancelLoad(self):
+        currLayout = self.ui.main_tabWidget.currentWidget()
+        if currLayout:
+            currLayout.cancelStream()
+
+    def showLibrary(self):
+        browser = self.ui.libraryBrowser
+        if not browser:
+            browser = LibraryBrowserUi(self.ui, self)
+            self.ui.addDockWidget(QtCore.Qt.RightDockWidgetArea, browser)
+            self.ui.libraryBrowser = browser
+        browser.setDirectory(self.default_file_dir)
+        browser.show()
+        browser.raise_()
+
+    def showSaveOptions(self):
+        currLayout = self.ui.main_tabWidget.currentWidget()
+        if not currLayout:
+            return
+        dialog = SaveOptionsUi(self.ui, currLayout.imageFormat, currLayout.imageQuality, currLayout.compression)
+        if dialog.exec_() == QtWidgets.QDialog.Accepted:
+            currLayout.imageFormat, currLayout.imageQuality, currLayout.compression = dialog.getOptions()
 
     def colorButtonPressed(self):
         self.timer.start()
@@ -1450,14 +2145,13 @@ class NuPicker(object):
         if currLayout:
             currLayout.redoIt()
 
-    def initDefault(self):
+    def initDefault(self, background=True):
         # add a default tab
         self.ui.main_tabWidget.clear()
         self.__createScriptJob = False
-        layout, index = self.newTab(name='default')
-        global activeTab
-        activeTab = layout
+        layout, index = self.newTab(name='default', background=background)
         self.__createScriptJob = True
+        self.__startupLayout = None if background else layout
 
     def dockUi(self, area):
         self.ui.dock(area=area)
@@ -1477,6 +2171,7 @@ class NuPicker(object):
 
             currLayout.fitInView(rect, QtCore.Qt.KeepAspectRatio)
             currLayout.scale(scaleFactor, scaleFactor)
+            currLayout.updateLod()
             currLayout.viewCenter = rect.center()
             currLayout.centerOn(currLayout.viewCenter)
 
@@ -1497,14 +2192,14 @@ class NuPicker(object):
         currLayout = self.ui.main_tabWidget.currentWidget()
         if currLayout:
             ns = str(self.ui.namespace_comboBox.currentText())
-            currLayout.namespace = ns
+            currLayout.setNamespace(ns)
             currLayout.setFocus()
             if self.__createScriptJob == True:
-                self.createScriptJob(currLayout)
                 currLayout.buttonSelectionChanged()
 
 
     def tabChanged(self):
+        self.updateLoadProgress()
         currLayout = self.ui.main_tabWidget.currentWidget()
         if currLayout:
             
@@ -1513,7 +2208,8 @@ class NuPicker(object):
             currLayout.setFocus()
             self.toggleScrollRoll()
             if self.__createScriptJob == True:
-                self.createScriptJob(currLayout)
+                # sync the tab that just became active
+                self.selectionChanged()
 
     def setNamespaceFromLayout(self, layout=None):
         if not layout:
@@ -1525,18 +2221,26 @@ class NuPicker(object):
                 comboBox.setCurrentIndex(i)
                 break
 
-    def createScriptJob(self, currLayout):
-        self.killJob()
-        ns = str(self.ui.namespace_comboBox.currentText())
-        global watchButtons
-        watchButtons = {}
-        for b in [i for i in currLayout.buttons if isinstance(i, NuPickerButton)]:
-            watchButtons[b] = ['|'.join('{}{}'.format(ns, s) for s in o.split('|')) for o in b.objs]
+    def createScriptJob(self):
+        # one callback for the life of the app, each layout keeps its own
+        # watch table up to date as buttons are added, removed or rebound
+        if self.__jobID is not None:
+            return
+        self.__jobID = backend.addEventCallback('SelectionChanged', self.selectionChanged)
 
-        global activeTab
-        activeTab = self.ui.main_tabWidget.currentWidget()
+    def selectionChanged(self, *args):
+        # only mark the picker dirty, the sync happens once the selection settles
+        self.__syncDirty = True
+        if not self.syncTimer.isActive():
+            self.syncTimer.start(self.syncLatency)
 
-        self.__jobID = pm.scriptJob(e=["SelectionChanged", pm.Callback(scriptJobWatch)], kws=True, cu=False)
+    def flushSync(self):
+        if not self.__syncDirty:
+            return
+        self.__syncDirty = False
+        currLayout = self.ui.main_tabWidget.currentWidget()
+        if currLayout:
+            scriptJobWatch(currLayout)
 
     def quit(self):
         self.ui.quit()
@@ -1545,15 +2249,13 @@ class NuPicker(object):
         self.ui.namespace_comboBox.clear()
         self.ui.namespace_comboBox.addItem('')
         currLayout = self.ui.main_tabWidget.currentWidget()
-        allNs = [ns for ns in pm.namespaceInfo(lon=True, r=True) if ns not in ['UI', 'shared']]
-        if allNs:
-            for ns in allNs:
-                self.ui.namespace_comboBox.addItem('{}:'.format(ns))
+        for ns in backend.namespaces():
+            self.ui.namespace_comboBox.addItem('{}:'.format(ns))
 
         self.setNamespaceFromLayout(layout=currLayout)
-        self.createScriptJob(currLayout)
+        self.createScriptJob()
 
-    def newTab(self, name=DEFAULT_TAB_NAME):
+    def newTab(self, name=DEFAULT_TAB_NAME, background=True):
         layout = NuPickerLayout(app=self, 
             parent=self.ui.main_tabWidget, 
             labelUi=[self.ui.label_lineEdit, self.ui.scale_label, self.ui.opacity_label],
@@ -1566,16 +2268,47 @@ class NuPicker(object):
         self.__createScriptJob = False
         self.ui.main_tabWidget.setCurrentWidget(layout)
         self.__createScriptJob = True
-        layout.setBackground(path=self.__default_bg_dir)
+        if background:
+            layout.setBackground(path=self.__default_bg_dir)
+        layout.autosavedRevision = layout.revision
         # layout.destroyed.connect(self.killJob)
         return layout, index
 
     def killJob(self):
-        try:
-            if pm.scriptJob(ex=self.__jobID):
-                pm.scriptJob(kill=self.__jobID, force=True)
-        except:
-            pass
+        self.syncTimer.stop()
+        self.__syncDirty = False
+        if self.__jobID is None:
+            return
+        backend.removeCallbacks([self.__jobID])
+        self.__jobID = None
+
+    def createSceneJobs(self):
+        self.killSceneJobs()
+        self.__sceneJobIDs = [backend.addSceneCallback(backend.SCENE_BEFORE_OPEN, self.sceneClosing),
+                            backend.addSceneCallback(backend.SCENE_BEFORE_NEW, self.sceneClosing),
+                            backend.addSceneCallback(backend.SCENE_AFTER_OPEN, self.sceneOpened),
+                            backend.addSceneCallback(backend.SCENE_AFTER_NEW, self.sceneOpened)]
+        self.resolver.createCallbacks()
+
+    def killSceneJobs(self):
+        backend.removeCallbacks(self.__sceneJobIDs)
+        self.__sceneJobIDs = []
+        self.resolver.killCallbacks()
+
+    def sceneClosing(self, *args):
+        # drop the selection callback before the scene goes away,
+        # the resolver drops its node callbacks and cached names on its own
+        self.killJob()
+        if not self.ui.isVisible():
+            self.sceneChangedWhileHidden = True
+
+    def sceneOpened(self, *args):
+        # a hidden app waits to be shown again
+        if not self.ui.isVisible():
+            return
+        self.createScriptJob()
+        if self.ui.main_tabWidget.currentWidget():
+            self.refreshNamespace()
         
 
     def tabRightClicked(self, pos):
@@ -1614,7 +2347,12 @@ class NuPicker(object):
 
     def closeTab(self):
         currIndex = self.ui.main_tabWidget.currentIndex()
+        layout = self.ui.main_tabWidget.widget(currIndex)
         self.ui.main_tabWidget.removeTab(currIndex)
+        if layout:
+            # stops a pending background decode
+            layout.close()
+            layout.deleteLater()
 
     def newButton(self, typ):
         # get current layout
@@ -1625,13 +2363,10 @@ class NuPicker(object):
             elif typ == 'cmd':
                 currLayout.newCmdButton()
 
-            self.createScriptJob(currLayout)
-
     def deleteButton(self):
         currLayout = self.ui.main_tabWidget.currentWidget()
         if currLayout:
             currLayout.deleteButton()
-            self.createScriptJob(currLayout)
 
     def setButtonColor(self, color):
         currLayout = self.ui.main_tabWidget.currentWidget()
@@ -1781,12 +2516,13 @@ class NuPicker(object):
         dialog.setDefaultSuffix('npk')
         dialog.setDirectory(self.default_file_dir)
         dialog.setAcceptMode(QtWidgets.QFileDialog.AcceptOpen)
-        pklPath = None
+        dialog.setFileMode(QtWidgets.QFileDialog.ExistingFiles)
+        pklPaths = []
         if dialog.exec_() == QtWidgets.QDialog.Accepted:
-            pklPath = dialog.selectedFiles()[0]
+            pklPaths = dialog.selectedFiles()
 
-        if pklPath:
-            self.load(path=str(pklPath))
+        if pklPaths:
+            self.loadFiles(paths=[str(p) for p in pklPaths])
 
 
     def save(self):
@@ -1829,127 +2565,274 @@ class NuPicker(object):
     def write(self, layout, path):
         path = os.path.normpath(path)
         if not os.path.exists(os.path.dirname(path)):
-            om.MGlobal.displayError('Path does not exist: {}'.format(path))
+            backend.displayError('Path does not exist: {}'.format(path))
             return
 
-        data = {}  # {'bg': path, 'name': name  
-                   #  pos(x, y): [label, size, opacity, color, objs]}
+        # only the snapshot is taken here, the file is written on a worker thread.
+        # a layout still loading is finished first, not saved with missing buttons
+        layout.finishStream()
+        layout.finishBackground()
+        name, buttons, pixmap_bytes = self.snapshot(layout)
+        # the background is only re-encoded when it or the save options changed
+        imageFormat = layout.imageFormat
+        if imageFormat and layout.bgEncoded:
+            source, encodedFormat, quality, data = layout.bgEncoded
+            if source is pixmap_bytes and encodedFormat == imageFormat and quality == layout.imageQuality:
+                pixmap_bytes, imageFormat = data, ''
+        self.saver.save(path, name, buttons, background=pixmap_bytes,
+                        imageFormat=imageFormat, quality=layout.imageQuality,
+                        compression=layout.compression, tag=(layout, layout.revision))
 
+        # set tool tip
+        layout.loadedFrom = path
+        tabBar = self.ui.main_tabWidget.tabBar()
+        indx = tabBar.currentIndex()
+        tabBar.setTabToolTip(indx, layout.loadedFrom)
+
+    def snapshot(self, layout):
+        '''
+        Return (name, buttons, background) of a layout, as written by npk.
+        Nothing is waited for, the buttons still streaming and a background
+        still decoding are left out.
+        '''
         currIndex = self.ui.main_tabWidget.indexOf(layout)
         currTabText = self.ui.main_tabWidget.tabText(currIndex)
 
         # set name
-        data['name'] = currTabText
+        name = currTabText
 
-        # set bg data
-        pixmap = layout.pixmapItem.pixmap()
-        ba = QtCore.QByteArray()
-        buff = QtCore.QBuffer(ba)
-        buff.open(QtCore.QIODevice.WriteOnly) 
-        pixmap.save(buff, "PNG")
-        pixmap_bytes = ba.data()
-        data['bg'] = pixmap_bytes
+        # set bg data, the encoded image kept when the background was set
+        pixmap_bytes = layout.bgBytes
 
+        buttons = []  # [label, size, opacity, color, exe, uuids, pos]
         for button in layout.buttons:
             scenePos = button.scenePos()
             x = scenePos.x()
             y = scenePos.y()
-            label = str(button.text.toPlainText())
+            label = button.label
             rect = button.rect()
             size = [button.scaleX, button.scaleY]
             opacity = button.opacity()
             color = [button.color.red(), button.color.green(), button.color.blue()]
+            uuids = []
             if isinstance(button, NuPickerButton):
-                exe = button.objs
+                exe = list(button.objs)
+                uuids = button.uuids
             else:
                 exe = '<{}>{}'.format(button.language, button.cmd)
-            data[(x, y)] = [label, size, opacity, color, exe]
-
-        with open(path, 'wb') as handle:
-            pickle.dump(data, handle)
-
-        # set tool tip
-        layout.loadedFrom = path
-        tabBar = self.ui.main_tabWidget.tabBar()
-        indx = tabBar.currentIndex()
-        tabBar.setTabToolTip(indx, layout.loadedFrom)
-
-        print('Saved: {}'.format(path))
-
-    def load(self, path):
-        path = os.path.normpath(path)
-        if not os.path.exists(path):
-            om.MGlobal.displayError('Path does not exist: {}'.format(path))
+            buttons.append([label, size, opacity, color, exe, list(uuids), (x, y)])
+        return name, buttons, pixmap_bytes
+
+    def layoutSaved(self, task):
+        layout, revision = task.tag
+        if not task.autosave:
+            print('Saved: {}'.format(task.path))
+            # kept for the next save, unless the background changed meanwhile
+            if task.imageFormat and task.background is layout.bgBytes:
+                layout.bgEncoded = (task.background, task.imageFormat, task.quality, task.encoded)
             return
+        # only a written autosave counts, the layout may have changed meanwhile
+        layout.autosavingRevision = None
+        layout.autosavedRevision = max(layout.autosavedRevision, revision)
+
+    def layoutSaveFailed(self, task, message):
+        if task.autosave:
+            layout = task.tag[0]
+            layout.autosavingRevision = None  # tried again on the next tick
+        backend.displayError('Cannot save {}: {}'.format(task.path, message))
+
+    def setAutosave(self, interval):
+        '''
+        Autosave the modified tabs every interval seconds, 0 turns it off.
+        '''
+        self.autosaveInterval = interval
+        self.autosaveTimer.stop()
+        if interval > 0:
+            self.autosaveTimer.start(int(interval * 1000))
+
+    def autosave(self):
+        tabWidget = self.ui.main_tabWidget
+        for i in xrange(tabWidget.count()):
+            layout = tabWidget.widget(i)
+            if not layout.isModified() or layout.autosavingRevision == layout.revision:
+                continue
+            # never block the timer, a layout still loading is autosaved once it is ready
+            if layout.isStreaming() or layout.isDecoding():
+                continue
+            if not os.path.exists(AUTOSAVE_DIR):
+                os.makedirs(AUTOSAVE_DIR)
+            layout.autosavingRevision = layout.revision
+            name, buttons, bg = self.snapshot(layout)
+            # the image is left as is, re-encoding it is not worth it for an autosave
+            self.saver.save(autosavePath(layout, name), name, buttons, background=bg, autosave=True,
+                            compression=layout.compression, tag=(layout, layout.revision))
 
+    def load(self, path):
+        self.loadFiles(paths=[path])
+
+    def loadFiles(self, paths):
+        '''
+        Read the files on the loader thread pool, each gets its tab once it is ready.
+        '''
+        toLoad = []
+        for path in paths:
+            path = os.path.normpath(path)
+            if not os.path.exists(path):
+                backend.displayError('Path does not exist: {}'.format(path))
+                continue
+            toLoad.append(path)
+        if toLoad:
+            self.loader.load(toLoad)
+
+    def layoutLoadFailed(self, path, message):
+        # nothing was created, a bad file doesn't leave an empty tab behind
+        backend.displayError('Cannot read {}: {}'.format(path, message))
+
+    def layoutLoaded(self, path, name, buttons, bg, compression):
         # new tab
-        layout, index = self.newTab()
+        layout, index = self.newTab(background=not bg)
         layout.loadedFrom = path
+        # saved back the way it was, the background data is kept as is
+        layout.imageFormat = ''
+        layout.compression = compression
 
         # set tool tip
         tabBar = self.ui.main_tabWidget.tabBar()
         indx = tabBar.currentIndex()
         tabBar.setTabToolTip(indx, layout.loadedFrom)
 
-        # read data from pickle file
-        data = None
-        with open(path, 'rb') as handle:
-            data = pickle.load(handle)
-
-        if not data:
-            return
-
         # set tab name
-        if 'name' in data:
-            tabName = data['name']
-        else:
+        tabName = name
+        if not tabName:
             tabName = os.path.splitext(os.path.basename(path))[0]
         self.ui.main_tabWidget.setTabText(index, tabName)
 
-        # clear the layout
-        layout.scene.clear()
-        layout.buttons = []
-
         # try to set background
-        if 'bg' in data:
-            layout.setBackground(data=data['bg'])
-        del data['name']
-        del data['bg']
-        for key, value in data.iteritems():
-            value.append(key)
-            layout.createButtonFromData(data=value)
-
-        self.createScriptJob(layout)
+        if bg:
+            layout.setBackground(data=bg)
+        layout.streamLoad(buttons)
+
         self.default_file_dir = os.path.dirname(path)
         print('Loaded: {}'.format(path))
 
-def scriptJobWatch():
-    pm.undoInfo(stateWithoutFlush=False)
+def autosavePath(layout, name):
+    '''
+    Autosave file of a layout, named after the tab and the file it was loaded from.
+    '''
+    safeName = re.sub(r'[^\w\-]', '_', name) or DEFAULT_TAB_NAME
+    source = layout.loadedFrom or str(id(layout))
+    return os.path.join(AUTOSAVE_DIR, '{}_{}.npk'.format(safeName, hashlib.md5(source.encode('utf-8')).hexdigest()[:8]))
+
+_buttonFont = None
+
+def buttonFont():
+    '''
+    Label font shared by every button.
+    '''
+    global _buttonFont
+    if _buttonFont is None:
+        _buttonFont = QtGui.QFont(FONT_NAME)
+    return _buttonFont
+
+_labelMetrics = {}  # font key: metrics, shared by every label of a font
+_staticLabels = {}  # label: static text, shared by the buttons with the same label
+
+def labelMetrics(font):
+    key = font.key()
+    metrics = _labelMetrics.get(key)
+    if metrics is None:
+        metrics = _labelMetrics[key] = QtGui.QFontMetricsF(font)
+    return metrics
+
+def labelSize(text):
+    '''
+    Size of a button label drawn with the button font, without margins.
+    '''
+    metrics = labelMetrics(buttonFont())
+    return QtCore.QSizeF(metrics.width(text), metrics.height())
+
+def staticLabel(text):
+    '''
+    Laid out label text, made once per label.
+    '''
+    label = _staticLabels.get(text)
+    if label is None:
+        label = _staticLabels[text] = QtGui.QStaticText(text)
+        label.setTextFormat(QtCore.Qt.PlainText)
+        label.prepare(QtGui.QTransform(), buttonFont())
+    return label
+
+def buttonDetail(button):
+    '''
+    How much of a button to draw at the view zoom of its layout,
+    LOD_FULL, LOD_NO_LABEL or LOD_FLAT.
+    The painter scale is not used, a cached button is painted at its cache
+    step and not at the zoom it is shown at.
+    '''
+    zoom = button.scene().viewZoom
+    if zoom < button.flatZoom:
+        return LOD_FLAT
+    if zoom < button.labelZoom:
+        return LOD_NO_LABEL
+    return LOD_FULL
+
+def updateLodZooms(button):
+    # view zooms the detail of the button changes at, see buttonDetail
+    itemScale = math.sqrt(abs(button.scaleX * button.scaleY)) or 1.0
+    rect = button.rect()
+    labelScale = CMD_LABEL_SCALE if isinstance(button, NuPickerCommandButton) else 1.0
+    button.flatZoom = LOD_FLAT_SIZE / (max(rect.width(), rect.height(), 1.0) * itemScale)
+    button.labelZoom = LOD_LABEL_HEIGHT / (labelMetrics(buttonFont()).height() * labelScale * itemScale)
+
+def paintFlat(button, painter):
+    # a few pixels on screen, the outline and antialiasing don't show
+    painter.setRenderHint(QtGui.QPainter.Antialiasing, False)
+    painter.fillRect(button.rect(), button.brush())
+
+def updateButtonCache(button):
+    '''
+    Cache a button at its layout zoom step, the cache is then reused by every
+    zoom within the step instead of being rasterized again at each one.
+    '''
+    updateLodZooms(button)
+    if button.cacheScale is None:
+        # zoomed in past the last step, few buttons are in view
+        button.setCacheMode(QtWidgets.QGraphicsItem.DeviceCoordinateCache)
+        return
+    rect = button.boundingRect()
+    scale = button.cacheScale
+    size = QtCore.QSize(max(1, int(math.ceil(rect.width() * button.scaleX * scale))),
+                        max(1, int(math.ceil(rect.height() * button.scaleY * scale))))
+    button.setCacheMode(QtWidgets.QGraphicsItem.ItemCoordinateCache, size)
+
+_placeholderBackground = None
+
+def placeholderBackground():
+    '''
+    Plain pixmap shown while the background of a layout is being decoded.
+    '''
+    global _placeholderBackground
+    if _placeholderBackground is None:
+        _placeholderBackground = QtGui.QPixmap(BG_SIZE, BG_SIZE)
+        _placeholderBackground.fill(gray)
+    return _placeholderBackground
+
+def scriptJobWatch(layout):
+    backend.setUndoRecording(False)
     
-    sels = mc.ls(sl=True, l=True, type='transform')
-    global watchButtons
-    global activeTab
-    activeTab.displayOnly = True
-    for b in watchButtons:
-        b.setSelected(False)
-
-    lenSels = len(sels)
-
-    for b, objs in watchButtons.iteritems():
-        lenObjs = len(objs)
-        if lenObjs > lenSels:
-            continue
-
-        f = 0
-        for s in sels:
-            for obj in objs:
-                if s.endswith(obj) or obj.endswith(s.split('|')[-1]):
-                    f += 1
-                    break
-
-        if f == lenObjs:
-            b.setSelected(True)
-
-    activeTab.displayOnly = False
-    pm.undoInfo(stateWithoutFlush=True)
+    sels, uuids = backend.selectedTransforms()
+    selectionSync = layout.selectionSync
+    layout.displayOnly = True
+    on = selectionSync.sync(sels, uuids)[0]
+
+    # only touch buttons whose state flips, plus picker selected buttons
+    # that are not matched anymore (clicked but partially missing objects)
+    for b in layout.scene.selectedItems():
+        if b in selectionSync and not selectionSync.isMatched(b):
+            b.setSelected(False)
+    for b in on:
+        b.setSelected(True)
+
+    layout.displayOnly = False
+    backend.setUndoRecording(True)
 
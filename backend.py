@@ -0,0 +1,133 @@
+# Maya backend for nuPicker.
+# Every call the picker makes to Maya goes through here, built on maya.cmds
+# and OpenMaya 2.0 only, so the hot paths never pay for PyMEL node wrapping.
+
+import maya.api.OpenMaya as om
+import maya.cmds as mc
+import maya.mel as mel
+
+#### selection modes, the mc.select flags of a plain, shift and ctrl click
+SELECT_REPLACE = 'replace'
+SELECT_ADD = 'add'
+SELECT_DESELECT = 'deselect'
+
+#### scene messages
+SCENE_BEFORE_OPEN = om.MSceneMessage.kBeforeOpen
+SCENE_BEFORE_NEW = om.MSceneMessage.kBeforeNew
+SCENE_AFTER_OPEN = om.MSceneMessage.kAfterOpen
+SCENE_AFTER_NEW = om.MSceneMessage.kAfterNew
+# (before, after) pairs around the file operations that add or remove nodes by the thousand
+SCENE_MESSAGES = ((SCENE_BEFORE_OPEN, SCENE_AFTER_OPEN),
+                (SCENE_BEFORE_NEW, SCENE_AFTER_NEW))
+REFERENCE_MESSAGES = ((om.MSceneMessage.kBeforeCreateReference, om.MSceneMessage.kAfterCreateReference),
+                    (om.MSceneMessage.kBeforeRemoveReference, om.MSceneMessage.kAfterRemoveReference),
+                    (om.MSceneMessage.kBeforeLoadReference, om.MSceneMessage.kAfterLoadReference),
+                    (om.MSceneMessage.kBeforeUnloadReference, om.MSceneMessage.kAfterUnloadReference),
+                    (om.MSceneMessage.kBeforeImportReference, om.MSceneMessage.kAfterImportReference))
+
+#### selection
+def selectedDagNodes():
+    '''
+    Return [(fullPath, namespace, isReferenced, uuid), ...] for the selected DAG nodes.
+    The namespace is the one of the node name with a trailing colon, or ''.
+    '''
+    result = []
+    selList = om.MGlobal.getActiveSelectionList()
+    for i in range(selList.length()):
+        try:
+            dagPath = selList.getDagPath(i)
+        except RuntimeError:  # not a DAG node
+            continue
+        fnNode = om.MFnDependencyNode(dagPath.node())
+        name = fnNode.name()
+        ns = '{}:'.format(name.rpartition(':')[0]) if ':' in name else ''
+        result.append((dagPath.fullPathName(), ns, fnNode.isFromReferencedFile, fnNode.uuid().asString()))
+    return result
+
+def selectedTransforms():
+    '''
+    Return the long names of the selected transforms and their UUIDs, in the same order.
+    '''
+    return mc.ls(sl=True, l=True, type='transform'), mc.ls(sl=True, type='transform', uuid=True)
+
+def selectNodes(nodes, mode=SELECT_REPLACE):
+    '''
+    Select a list of node names in one undoable command, without building a MEL string.
+    mode is SELECT_REPLACE, SELECT_ADD or SELECT_DESELECT.
+    '''
+    if not nodes:
+        if mode == SELECT_REPLACE:
+            mc.select(clear=True)
+        return
+    mc.select(nodes, **{mode: True})
+
+#### names
+# mc.ls lists the whole scene when given an empty list, these guard against it
+def longNames(names):
+    '''
+    Return the long names of every node matching the given names.
+    '''
+    if not names:
+        return []
+    return mc.ls(names, long=True)
+
+def nodesFromUuids(uuids):
+    '''
+    Return {uuid: [long name, ...]} for the given UUIDs.
+    Every reference of a file shares the same UUIDs, so a UUID can give many nodes.
+    '''
+    result = {}
+    nodes = longNames(uuids)
+    if nodes:
+        for node, uuid in zip(nodes, mc.ls(nodes, uuid=True)):
+            result.setdefault(uuid, []).append(node)
+    return result
+
+def namespaces():
+    return [ns for ns in mc.namespaceInfo(lon=True, r=True) or [] if ns not in ['UI', 'shared']]
+
+#### commands
+def runMel(cmd):
+    return mel.eval(cmd)
+
+def setUndoRecording(state):
+    mc.undoInfo(stateWithoutFlush=state)
+
+def displayError(msg):
+    om.MGlobal.displayError(msg)
+
+#### callbacks
+def addEventCallback(event, func):
+    return om.MEventMessage.addEventCallback(event, func)
+
+def addSceneCallback(msg, func):
+    return om.MSceneMessage.addCallback(msg, func)
+
+def addNodeCallbacks(added, removed, renamed, reparented):
+    '''
+    Register callbacks for DAG nodes added, removed, renamed and reparented.
+        added(name), removed(name), renamed(name, prevName), reparented(name)
+    '''
+    def nodeAdded(node, *args):
+        added(om.MFnDependencyNode(node).name())
+
+    def nodeRemoved(node, *args):
+        removed(om.MFnDependencyNode(node).name())
+
+    def nodeRenamed(node, prevName, *args):
+        renamed(om.MFnDependencyNode(node).name(), prevName)
+
+    def dagChanged(msgType, child, parent, *args):
+        reparented(child.partialPathName())
+
+    return [om.MDGMessage.addNodeAddedCallback(nodeAdded, 'dagNode'),
+            om.MDGMessage.addNodeRemovedCallback(nodeRemoved, 'dagNode'),
+            om.MNodeMessage.addNameChangedCallback(om.MObject.kNullObj, nodeRenamed),
+            om.MDagMessage.addAllDagChangesCallback(dagChanged)]
+
+def removeCallbacks(callbackIDs):
+    for callbackID in callbackIDs:
+        try:
+            om.MMessage.removeCallback(callbackID)
+        except:
+            pass
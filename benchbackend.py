@@ -0,0 +1,149 @@
+# Import time and per-click benchmark of the PyMEL-free backend.
+# Compares what the picker paid with PyMEL, importing pymel.core and wrapping
+# every selected node, with backend.py built on maya.cmds and OpenMaya 2.0.
+# Needs Maya, run it with mayapy from this directory:
+#
+#   mayapy benchbackend.py
+#   mayapy benchbackend.py --objects 10 100 1000 --repeat 20 --imports 5
+#
+# Imports are timed in a new mayapy process each, after maya.standalone is
+# initialized so only the module import itself is counted. Clicks are timed
+# on a referenced rig, the way the picker is used on animation scenes.
+# Times are the median of the repeats.
+
+from __future__ import print_function
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+IMPORT_SNIPPET = '''
+import sys, time
+sys.path.insert(0, {path!r})
+import maya.standalone
+maya.standalone.initialize()
+start = time.time()
+import {module}
+print(time.time() - start)
+'''
+
+NAMESPACE = 'char'
+
+
+#### imports
+def timeImport(module, repeat):
+    '''
+    Median seconds to import module in a new interpreter.
+    '''
+    snippet = IMPORT_SNIPPET.format(path=os.path.dirname(os.path.abspath(__file__)), module=module)
+    times = []
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', snippet])
+        times.append(float(out.decode('ascii').strip().splitlines()[-1]))
+    times.sort()
+    return times[len(times) // 2]
+
+#### scene
+def buildScene(count):
+    '''
+    Reference a rig of count controls under NAMESPACE and select them all.
+    '''
+    import maya.cmds as mc
+    mc.file(new=True, force=True)
+    root = mc.createNode('transform', name='rig')
+    for g in range(0, count, 10):
+        grp = mc.createNode('transform', name='grp_{:04d}'.format(g), parent=root)
+        for c in range(g, min(g + 10, count)):
+            mc.createNode('transform', name='ctrl_{:04d}'.format(c), parent=grp)
+    path = os.path.join(tempfile.gettempdir(), 'benchbackend_{}.ma'.format(count))
+    mc.file(rename=path)
+    mc.file(save=True, type='mayaAscii', force=True)
+    mc.file(new=True, force=True)
+    mc.file(path, reference=True, namespace=NAMESPACE)
+    controls = mc.ls('{}:ctrl_*'.format(NAMESPACE), long=True)
+    mc.select(controls, replace=True)
+    return controls
+
+#### clicks
+def pymelBind(pm):
+    # bind() before the backend
+    objs = []
+    for sel in pm.selected():
+        fp = sel.fullPath()[1:]
+        if sel.isReferenced() == True:
+            ns = sel.namespace()
+            fpRef = '|'.join([p for p in fp.split('|') if p.startswith(ns)])
+            objs.append(fpRef.replace(ns, ''))
+        else:
+            objs.append(fp)
+    return objs
+
+def backendBind(backend):
+    # bind() now
+    objs = []
+    for fullPath, ns, isReferenced, uuid in backend.selectedDagNodes():
+        fp = fullPath[1:]
+        if isReferenced == True:
+            fpRef = '|'.join([p for p in fp.split('|') if p.startswith(ns)])
+            objs.append(fpRef.replace(ns, ''))
+        else:
+            objs.append(fp)
+    return objs
+
+def pymelSelect(pm, mel, nodes):
+    # objExists per object then a MEL select, as buttonSelectionChanged did
+    found = [node for node in nodes if pm.objExists(node) == True]
+    mel.eval('select -r {};'.format(' '.join(found)))
+
+def backendSelect(backend, nodes):
+    backend.selectNodes(backend.longNames(nodes))
+
+def timeIt(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    times.sort()
+    return times[len(times) // 2] * 1000
+
+#### main
+def parseArgs():
+    parser = argparse.ArgumentParser(description='Time the picker Maya calls with PyMEL and with the backend.')
+    parser.add_argument('--objects', type=int, nargs='+', default=[10, 100, 1000],
+                        help='selected objects per click')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--imports', type=int, default=5, help='processes started per import timing')
+    return parser.parse_args()
+
+def main():
+    options = parseArgs()
+
+    print('import time, median of {} processes'.format(options.imports))
+    for module in ('pymel.core', 'backend'):
+        print('  {:<12} {:>8.3f} s'.format(module, timeImport(module, options.imports)))
+
+    import maya.standalone
+    maya.standalone.initialize()
+    import maya.mel as mel
+    import pymel.core as pm
+    import backend
+
+    print('')
+    print('{:>8} {:>14} {:>14} {:>16} {:>16}'.format(
+        'objects', 'pymel bind ms', 'backend bind', 'pymel select ms', 'backend select'))
+    for count in options.objects:
+        controls = buildScene(count)
+        assert pymelBind(pm) == backendBind(backend)
+        bindPm = timeIt(lambda: pymelBind(pm), options.repeat)
+        bindBackend = timeIt(lambda: backendBind(backend), options.repeat)
+        selectPm = timeIt(lambda: pymelSelect(pm, mel, controls), options.repeat)
+        selectBackend = timeIt(lambda: backendSelect(backend, controls), options.repeat)
+        print('{:>8} {:>14.2f} {:>14.2f} {:>16.2f} {:>16.2f}'.format(
+            count, bindPm, bindBackend, selectPm, selectBackend))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# Background codec benchmark of .npk layout files.
+# Encodes a background with every image format the Qt plugins can write and
+# saves it in a layout with each button compression, then times the save
+# (re-encode and write) and the load (read and decode at the picker size).
+# Needs PySide2, no Maya. Pass a real library background with --image:
+#
+#   python benchimages.py --image P:/Library/GeneralLibrary/picker/body.png
+#   QT_QPA_PLATFORM=offscreen python benchimages.py --quality 75 90
+#
+# 'keep' is the image data as it is, the file given with --image or the PNG
+# the picker always saved, pixmap.save with the Qt defaults. A format the
+# image is already in is kept as is too, so it has no row of its own.
+# Times are the median of the repeats.
+
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+
+from PySide2 import QtCore, QtGui
+
+import benchnpk
+import images
+import npk
+
+BG_SIZE = 1024  # app.BG_SIZE, the size backgrounds are decoded at
+
+
+#### image
+def makeImage(size=2048, seed=0):
+    '''
+    A stand-in picker background: a gradient with soft shapes and a little noise.
+    '''
+    rng = random.Random(seed)
+    image = QtGui.QImage(size, size, QtGui.QImage.Format_RGB32)
+    painter = QtGui.QPainter(image)
+    painter.setRenderHint(QtGui.QPainter.Antialiasing)
+    gradient = QtGui.QLinearGradient(0, 0, 0, size)
+    gradient.setColorAt(0, QtGui.QColor(70, 80, 95))
+    gradient.setColorAt(1, QtGui.QColor(25, 28, 35))
+    painter.fillRect(image.rect(), gradient)
+    for _ in range(60):
+        color = QtGui.QColor(rng.randint(80, 220), rng.randint(80, 220), rng.randint(80, 220), 160)
+        painter.setBrush(color)
+        painter.setPen(QtGui.QPen(color.darker(), 4))
+        w, h = rng.randint(40, 400), rng.randint(40, 400)
+        painter.drawEllipse(rng.randint(0, size - w), rng.randint(0, size - h), w, h)
+    painter.end()
+    for _ in range(size * size // 50):
+        x, y = rng.randrange(size), rng.randrange(size)
+        c = QtGui.QColor(image.pixel(x, y))
+        image.setPixel(x, y, c.lighter(rng.randint(100, 115)).rgb())
+    return image
+
+def pngBytes(image):
+    # what NuPicker.write saved before the save options
+    ba = QtCore.QByteArray()
+    buff = QtCore.QBuffer(ba)
+    buff.open(QtCore.QIODevice.WriteOnly)
+    image.save(buff, 'PNG')
+    return ba.data()
+
+#### main
+def parseArgs():
+    parser = argparse.ArgumentParser(description='Time the background formats of .npk files.')
+    parser.add_argument('--image', default='', help='background image, a generated one by default')
+    parser.add_argument('--quality', type=int, nargs='+', default=[75, 90], help='jpg and webp qualities')
+    parser.add_argument('--buttons', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    return parser.parse_args()
+
+def main():
+    options = parseArgs()
+    app = QtGui.QGuiApplication([])
+    if options.image:
+        source = images.readBytes(options.image)
+        image = images.readImage(data=source)
+    else:
+        image = makeImage()
+        source = pngBytes(image)
+    if image.isNull():
+        print('Cannot read {}'.format(options.image))
+        return 1
+    name, buttons, _ = benchnpk.makeLayout(options.buttons, 0)
+
+    codecs = [('keep', -1)]
+    for format in images.writableFormats():
+        if format == npk.imageFormat(source):
+            continue
+        if format == 'png':
+            codecs.append((format, -1))
+        else:
+            codecs.extend((format, quality) for quality in options.quality)
+
+    folder = tempfile.mkdtemp()
+    print('{}x{} background, {} buttons, formats: {}'.format(
+        image.width(), image.height(), options.buttons, ', '.join(images.writableFormats())))
+    print('{:<10} {:<6} {:>9} {:>10} {:>10} {:>10} {:>10}'.format(
+        'format', 'comp', 'image KB', 'file KB', 'save ms', 'load ms', 'decode ms'))
+    try:
+        for format, quality in codecs:
+            for compression in npk.availableCompressions():
+                path = os.path.join(folder, 'bench.npk')
+                label = format if quality < 0 else '{} {}'.format(format, quality)
+                imageFormat = '' if format == 'keep' else format
+
+                def save():
+                    background = images.encodeImage(source, imageFormat, quality)
+                    npk.write(path, name, buttons, background, compression=compression)
+                    return background
+
+                def load():
+                    background = npk.read(path)[2]
+                    return images.readImage(data=background, size=BG_SIZE)
+
+                background = save()
+                assert not load().isNull()
+                saveTime = benchnpk.timeIt(save, options.repeat)
+                loadTime = benchnpk.timeIt(load, options.repeat)
+                decodeTime = benchnpk.timeIt(lambda: images.readImage(data=background, size=BG_SIZE), options.repeat)
+                print('{:<10} {:<6} {:>9.0f} {:>10.0f} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+                    label, compression or 'none', len(background) / 1024.0, os.path.getsize(path) / 1024.0,
+                    saveTime, loadTime, decodeTime))
+    finally:
+        shutil.rmtree(folder)
+    del app
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+# Zoom benchmark of the button cache policy and level of detail.
+# Repaints a view of a large layout through a zoom out and back in sweep,
+# with the buttons cached the way the picker used to (DeviceCoordinateCache,
+# rasterized again at every zoom) and at CACHE_SCALES steps, to compare
+# the frame times, the repaints and the cache memory of each step list.
+# Needs PySide2, no Maya: app.py imports Maya, so the button painting and
+# updateLod are reproduced here, keep them in sync with app.py.
+#
+#   QT_QPA_PLATFORM=offscreen python benchlod.py
+#   python benchlod.py --buttons 5000 --steps 0.5 1 2 4
+#
+# Frame times are the median and the slowest frame of the sweep.
+
+from __future__ import print_function
+
+import argparse
+import math
+import time
+
+from PySide2 import QtCore, QtGui, QtWidgets
+
+# from app.py
+CACHE_SCALES = (0.25, 0.35, 0.5, 0.71, 1.0, 1.41, 2.0, 2.83, 4.0, 5.66, 8.0)
+LOD_LABEL_HEIGHT = 5.0
+LOD_FLAT_SIZE = 6.0
+ZOOM_STEP = 0.05
+MIN_ZOOM = 0.168261435398
+DEFAULT_SIZE = 15
+LABEL_MARGIN = 4.0
+FONT_NAME = 'Fixedsys'
+
+X2_SCALES = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0)  # the steps CACHE_SCALES had first
+
+_paints = [0]
+
+
+class Button(QtWidgets.QGraphicsRectItem):
+    '''
+    Paints like NuPickerButton, a rect with its label or a flat rect when tiny.
+    '''
+    def __init__(self, label, scale, color, font):
+        super(Button, self).__init__()
+        metrics = QtGui.QFontMetricsF(font)
+        self.font = font
+        self.label = label
+        self.staticLabel = QtGui.QStaticText(label)
+        self.staticLabel.prepare(QtGui.QTransform(), font)
+        self.labelRect = QtCore.QRectF(LABEL_MARGIN, LABEL_MARGIN, metrics.width(label), metrics.height())
+        self.setRect(0, 0, self.labelRect.width() + LABEL_MARGIN * 2, self.labelRect.height() + LABEL_MARGIN * 2)
+        self.setTransform(QtGui.QTransform.fromScale(scale, scale))
+        self.setBrush(QtGui.QBrush(color))
+        self.setPen(QtGui.QPen(color))
+        self.scaleX = self.scaleY = scale
+        self.flatZoom = LOD_FLAT_SIZE / (max(self.rect().width(), self.rect().height()) * scale)
+        self.labelZoom = LOD_LABEL_HEIGHT / (metrics.height() * scale)
+        self.cacheScale = 1.0
+
+    def paint(self, painter, option, widget=None):
+        _paints[0] += 1
+        zoom = self.scene().viewZoom
+        if zoom < self.flatZoom:
+            painter.setRenderHint(QtGui.QPainter.Antialiasing, False)
+            painter.fillRect(self.rect(), self.brush())
+            return
+        super(Button, self).paint(painter, option, widget)
+        if zoom >= self.labelZoom:
+            painter.setFont(self.font)
+            painter.setPen(QtCore.Qt.black)
+            painter.drawStaticText(self.labelRect.topLeft(), self.staticLabel)
+
+def updateButtonCache(button, policy):
+    if policy == 'none':
+        button.setCacheMode(QtWidgets.QGraphicsItem.NoCache)
+    elif policy == 'device' or button.cacheScale is None:
+        button.setCacheMode(QtWidgets.QGraphicsItem.DeviceCoordinateCache)
+    else:
+        rect = button.boundingRect()
+        size = QtCore.QSize(max(1, int(math.ceil(rect.width() * button.scaleX * button.cacheScale))),
+                            max(1, int(math.ceil(rect.height() * button.scaleY * button.cacheScale))))
+        button.setCacheMode(QtWidgets.QGraphicsItem.ItemCoordinateCache, size)
+
+def updateLod(view, buttons, policy, steps):
+    # NuPickerLayout.updateLod
+    zoom = view.transform().m11()
+    prevZoom, view.scene().viewZoom = view.scene().viewZoom, zoom
+    scale = None
+    for step in steps:
+        if step >= zoom:
+            scale = step
+            break
+    if scale == view.cacheScale:
+        low, high = min(prevZoom, zoom), max(prevZoom, zoom)
+        if low != high:
+            for button in buttons:
+                if low < button.flatZoom <= high or low < button.labelZoom <= high:
+                    button.update()
+        return
+    view.cacheScale = scale
+    for button in buttons:
+        button.cacheScale = scale
+        updateButtonCache(button, policy)
+
+def cacheBytes(view, policy, zoom):
+    # the pixmaps the buttons in view need in the cache, at 4 bytes a pixel
+    total = 0
+    for button in view.items(view.viewport().rect()):
+        rect = button.boundingRect()
+        scale = zoom if policy == 'device' or button.cacheScale is None else button.cacheScale
+        total += math.ceil(rect.width() * button.scaleX * scale) * math.ceil(rect.height() * button.scaleY * scale) * 4
+    return total
+
+#### layout
+def makeView(count, policy, steps):
+    scene = QtWidgets.QGraphicsScene()
+    scene.viewZoom = 1.0
+    view = QtWidgets.QGraphicsView(scene)
+    view.layoutScene = scene  # the view doesn't own it, as NuPickerLayout.scene
+    view.cacheScale = 1.0
+    view.setRenderHint(QtGui.QPainter.Antialiasing)
+    view.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+    view.setTransformationAnchor(QtWidgets.QGraphicsView.NoAnchor)
+    view.resize(1280, 800)
+    font = QtGui.QFont(FONT_NAME)
+    columns = int(math.sqrt(count * 2))
+    buttons = []
+    for i in range(count):
+        scale = (0.5, 1.0, 1.5)[i % 3]
+        color = QtGui.QColor.fromHsv((i * 37) % 360, 160, 220)
+        button = Button('c{}'.format(i % 100), scale, color, font)
+        button.setPos((i % columns) * 40.0, (i // columns) * 40.0)
+        updateButtonCache(button, policy)
+        scene.addItem(button)
+        buttons.append(button)
+    scene.setSceneRect(scene.itemsBoundingRect())
+    view.show()
+    return view, buttons
+
+def sweep(view, buttons, policy, steps, maxZoom):
+    '''
+    Zoom out to the smallest zoom, in to maxZoom and back to 1 one wheel step
+    at a time, repainting each frame. Returns the frame times in ms,
+    the paint calls and the largest cache size.
+    '''
+    factor = 1.0 + ZOOM_STEP
+    zooms = []
+    zoom = 1.0
+    while zoom / factor > MIN_ZOOM:
+        zoom /= factor
+        zooms.append(1.0 / factor)
+    while zoom * factor < maxZoom:
+        zoom *= factor
+        zooms.append(factor)
+    while zoom / factor > 1.0:
+        zoom /= factor
+        zooms.append(1.0 / factor)
+
+    center = view.sceneRect().center()
+    view.viewport().grab()  # repaint() does not paint on the offscreen platform
+    _paints[0] = 0
+    times = []
+    maxCache = 0
+    for f in zooms:
+        start = time.time()
+        view.scale(f, f)
+        updateLod(view, buttons, policy, steps)
+        view.centerOn(center)
+        view.viewport().grab()  # repaint() does not paint on the offscreen platform
+        times.append((time.time() - start) * 1000)
+        if policy != 'none':
+            maxCache = max(maxCache, cacheBytes(view, policy, view.transform().m11()))
+    return times, _paints[0], maxCache
+
+#### main
+def parseArgs():
+    parser = argparse.ArgumentParser(description='Time zooming a large layout with each button cache policy.')
+    parser.add_argument('--buttons', type=int, default=3000)
+    parser.add_argument('--max-zoom', type=float, default=4.0)
+    parser.add_argument('--steps', type=float, nargs='+', default=[],
+                        help='an extra list of cache steps to compare')
+    parser.add_argument('--pixmap-cache', type=int, default=0,
+                        help='QPixmapCache limit in MB, the item caches live there, the Qt default otherwise')
+    return parser.parse_args()
+
+def main():
+    options = parseArgs()
+    app = QtWidgets.QApplication([])
+    if options.pixmap_cache:
+        QtGui.QPixmapCache.setCacheLimit(options.pixmap_cache * 1024)
+    cases = [('no cache', 'none', CACHE_SCALES),
+            ('device cache', 'device', CACHE_SCALES),
+            ('steps x2', 'steps', X2_SCALES),
+            ('CACHE_SCALES', 'steps', CACHE_SCALES)]
+    if options.steps:
+        cases.append(('steps {}'.format(' '.join(str(s) for s in options.steps)), 'steps', sorted(options.steps)))
+
+    print('{} buttons, zoom {:.3f} to {} and back, {} steps, {} MB QPixmapCache'.format(
+        options.buttons, MIN_ZOOM, options.max_zoom, ZOOM_STEP, QtGui.QPixmapCache.cacheLimit() // 1024))
+    print('{:<16} {:>10} {:>10} {:>10} {:>12} {:>13}'.format(
+        'cache', 'median ms', 'max ms', 'total ms', 'paints', 'in view MB'))
+    for name, policy, steps in cases:
+        view, buttons = makeView(options.buttons, policy, steps)
+        times, paints, maxCache = sweep(view, buttons, policy, steps, options.max_zoom)
+        times.sort()
+        print('{:<16} {:>10.1f} {:>10.1f} {:>10.0f} {:>12} {:>13.1f}'.format(
+            name, times[len(times) // 2], times[-1], sum(times), paints, maxCache / 1048576.0))
+        view.close()
+        view.deleteLater()
+    del app
+
+if __name__ == '__main__':
+    main()
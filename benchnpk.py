@@ -0,0 +1,115 @@
+# Save and load benchmark of the .npk layout format.
+# Writes a generated layout as npk v2 with each available compression and
+# as the legacy pickle the picker used to save, then times saving, loading
+# and the migration of the pickle file through npk.loads.
+# Pure Python, no Maya and no Qt:
+#
+#   python benchnpk.py
+#   python benchnpk.py --buttons 10000 --background 300 --repeat 10
+#
+# Times are the median of the repeats, saves include writing the file.
+
+from __future__ import print_function
+
+import argparse
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import time
+
+import npk
+
+COMMAND_EVERY = 10  # one button in COMMAND_EVERY is a command button
+
+
+#### layout
+def makeLayout(count, backgroundSize, withUuids=False, seed=0):
+    '''
+    Return (name, buttons, background) of a layout with count buttons bound to
+    the controls of a rig, background is backgroundSize bytes of noise.
+    The legacy format has no UUIDs, they are only added with withUuids.
+    '''
+    rng = random.Random(seed)
+    buttons = []
+    for i in range(count):
+        pos = (float(i % 100) * 12.5, float(i // 100) * 12.5)
+        size = [rng.choice((0.5, 1.0, 1.5)), rng.choice((0.5, 1.0, 1.5))]
+        color = [rng.randint(0, 255) for _ in range(3)]
+        if i % COMMAND_EVERY:
+            exe = ['rig|spine_{:02d}|ctrl_{:05d}_{}'.format(i % 40, i, j) for j in range(rng.randint(1, 6))]
+            uuids = ['{:08X}-0000-0000-0000-{:012X}'.format(i, j) for j in range(len(exe))] if withUuids else []
+            label = 'c{}'.format(i % 100)
+        else:
+            exe = '<python>import maya.cmds as mc\nmc.setAttr("<ns>ctrl_{:05d}.ikFk", 1)'.format(i)
+            uuids = []
+            label = 'IK'
+        buttons.append([label, size, rng.choice((0.5, 1.0)), color, exe, uuids, pos])
+    background = bytes(bytearray(rng.getrandbits(8) for _ in range(backgroundSize)))
+    return 'benchmark', buttons, background
+
+def legacyDumps(name, buttons, background, protocol):
+    # the dict NuPicker.write pickled before npk, keyed by position
+    data = {'name': name, 'bg': background}
+    for label, size, opacity, color, exe, uuids, pos in buttons:
+        data[tuple(pos)] = [label, size, opacity, color, exe]
+    return pickle.dumps(data, protocol)
+
+#### timing
+def timeIt(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    times.sort()
+    return times[len(times) // 2] * 1000
+
+def writeBytes(path, data):
+    with open(path, 'wb') as handle:
+        handle.write(data)
+
+def readBytes(path):
+    with open(path, 'rb') as handle:
+        return handle.read()
+
+#### main
+def parseArgs():
+    parser = argparse.ArgumentParser(description='Time saving and loading .npk layouts.')
+    parser.add_argument('--buttons', type=int, default=10000)
+    parser.add_argument('--background', type=int, default=300, help='background size in KB')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--uuids', action='store_true', help='bind the pick buttons with UUIDs too, npk only')
+    return parser.parse_args()
+
+def main():
+    options = parseArgs()
+    name, buttons, background = makeLayout(options.buttons, options.background * 1024, options.uuids)
+    folder = tempfile.mkdtemp()
+    print('{} buttons, {} KB background{}'.format(options.buttons, options.background,
+                                                  ', with UUIDs' if options.uuids else ''))
+    print('{:<18} {:>9} {:>10} {:>10}'.format('format', 'size MB', 'save ms', 'load ms'))
+    try:
+        for compression in npk.availableCompressions():
+            path = os.path.join(folder, 'v2_{}.npk'.format(compression or 'none'))
+            save = timeIt(lambda: npk.write(path, name, buttons, background, compression=compression), options.repeat)
+            load = timeIt(lambda: npk.read(path), options.repeat)
+            assert len(npk.read(path)[1]) == len(buttons)
+            print('{:<18} {:>9.2f} {:>10.1f} {:>10.1f}'.format(
+                'npk {}'.format(compression or 'none'), os.path.getsize(path) / 1048576.0, save, load))
+
+        # protocol 0 is what Maya's Python 2 pickled by default
+        for protocol in (0, pickle.HIGHEST_PROTOCOL):
+            path = os.path.join(folder, 'legacy_{}.pkl'.format(protocol))
+            save = timeIt(lambda: writeBytes(path, legacyDumps(name, buttons, background, protocol)), options.repeat)
+            load = timeIt(lambda: pickle.loads(readBytes(path)), options.repeat)
+            migrate = timeIt(lambda: npk.loads(readBytes(path)), options.repeat)
+            assert len(npk.loads(readBytes(path))[1]) == len(buttons)
+            print('{:<18} {:>9.2f} {:>10.1f} {:>10.1f}  migration {:.1f} ms'.format(
+                'pickle protocol {}'.format(protocol), os.path.getsize(path) / 1048576.0, save, load, migrate))
+    finally:
+        shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# Per-click benchmark of the object resolution of picker buttons.
+# Compares the loop buttonSelectionChanged used to run, one pm.objExists and
+# one mc.ls per bound object, with NameResolver.resolveMany, which looks up
+# every object of the clicked buttons with a few bulk mc.ls queries.
+# Needs Maya, run it with mayapy from this directory:
+#
+#   mayapy benchresolve.py
+#   mayapy benchresolve.py --objects 10 100 1000 --repeat 20
+#
+# Each button is bound to its objects under a 'char:' namespace, a fifth of
+# them with a stale parent so only the short name fallback finds them.
+# Times are the median of the repeats, cold is a new resolver for every
+# click, warm is the cache hit of the next clicks.
+
+from __future__ import print_function
+
+import argparse
+import time
+
+try:
+    import maya.standalone
+    maya.standalone.initialize()
+except (ImportError, RuntimeError):  # inside a Maya session
+    pass
+
+import maya.cmds as mc
+import maya.mel as mel
+
+try:
+    import pymel.core as pm
+    objExists = pm.objExists
+except ImportError:
+    objExists = mc.objExists
+
+import backend
+import resolver
+
+NAMESPACE = 'char:'
+STALE_EVERY = 5  # one object in STALE_EVERY is bound under a parent that was renamed since
+
+
+#### scene
+def buildScene(count):
+    '''
+    Make count transforms under NAMESPACE and return the bound objects,
+    [(path, uuid), ...] as a button stores them.
+    '''
+    mc.file(new=True, force=True)
+    mc.namespace(add=NAMESPACE.rstrip(':'))
+    root = mc.createNode('transform', name=NAMESPACE + 'rig')
+    objs = []
+    for g in range(0, count, 10):
+        grp = mc.createNode('transform', name='{}grp_{:04d}'.format(NAMESPACE, g), parent=root)
+        for c in range(g, min(g + 10, count)):
+            node = mc.createNode('transform', name='{}ctrl_{:04d}'.format(NAMESPACE, c), parent=grp)
+            uuid = mc.ls(node, uuid=True)[0]
+            parent = 'grp_{:04d}'.format(g) if c % STALE_EVERY else 'oldGrp_{:04d}'.format(g)
+            objs.append(('rig|{}|ctrl_{:04d}'.format(parent, c), uuid))
+    return objs
+
+#### clicks
+def legacyClick(objs):
+    '''
+    The loop of buttonSelectionChanged before the bulk resolution, plus its MEL select.
+    '''
+    ns = '|{}'.format(NAMESPACE)
+    objNames = set()
+    for obj, uuid in objs:
+        name = '{}{}'.format(NAMESPACE, obj.replace('|', ns))
+        shortName = name.split('|')[-1]
+        if objExists(name) == True:
+            objNames.add(name)
+        elif len(mc.ls(shortName)) == 1:
+            objNames.add(shortName)
+    mel.eval('select -r {};'.format(' '.join(objNames)))
+    return objNames
+
+def bulkClick(nameResolver, objs):
+    nodes = [node for node in nameResolver.resolveMany(NAMESPACE, objs) if node]
+    backend.selectNodes(nodes)
+    return nodes
+
+def timeIt(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    times.sort()
+    return times[len(times) // 2] * 1000
+
+#### main
+def parseArgs():
+    parser = argparse.ArgumentParser(description='Time the object resolution of a picker button click.')
+    parser.add_argument('--objects', type=int, nargs='+', default=[10, 100, 1000],
+                        help='objects bound to the clicked button')
+    parser.add_argument('--repeat', type=int, default=20)
+    return parser.parse_args()
+
+def main():
+    options = parseArgs()
+    print('objExists from {}'.format(objExists.__module__))
+    print('{:>8} {:>12} {:>12} {:>12} {:>12} {:>9}'.format(
+        'objects', 'legacy ms', 'cold ms', 'cold path ms', 'warm ms', 'speedup'))
+    for count in options.objects:
+        objs = buildScene(count)
+        paths = [(path, None) for path, uuid in objs]
+        assert len(legacyClick(objs)) == len(bulkClick(resolver.NameResolver(), paths)) == count
+
+        legacy = timeIt(lambda: legacyClick(objs), options.repeat)
+        cold = timeIt(lambda: bulkClick(resolver.NameResolver(), objs), options.repeat)
+        coldPath = timeIt(lambda: bulkClick(resolver.NameResolver(), paths), options.repeat)
+        warmResolver = resolver.NameResolver()
+        bulkClick(warmResolver, objs)
+        warm = timeIt(lambda: bulkClick(warmResolver, objs), options.repeat)
+        print('{:>8} {:>12.2f} {:>12.2f} {:>12.2f} {:>12.2f} {:>8.1f}x'.format(
+            count, legacy, cold, coldPath, warm, legacy / cold))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# Command button code cache for nuPicker.
+# Command bodies are compiled once per (button, namespace), Python into code
+# objects and MEL into a sourced global proc, so a click only runs them.
+# Python runs in Maya's __main__ namespace, as commands typed in the script
+# editor do.
+
+import __main__
+import itertools
+import re
+
+import backend
+
+NS_TOKEN = '<ns>'
+MEL_PROC_PREFIX = 'nuPickerCmd'
+
+# global procs live for the whole Maya session, every compiled MEL command gets
+# its own name and the names of the dropped commands are defined again by the next ones
+_procIDs = itertools.count()
+_freeProcNames = []
+
+
+def procName():
+    if _freeProcNames:
+        return _freeProcNames.pop()
+    return '{}{}'.format(MEL_PROC_PREFIX, next(_procIDs))
+
+
+class CompiledCommand(object):
+    '''
+    A command body with the namespace applied, compiled on its first run.
+    '''
+    def __init__(self, language, cmd, namespace):
+        self.language = language
+        self.cmd = cmd
+        self.namespace = namespace
+        self.source = cmd.replace(NS_TOKEN, namespace)
+        self._code = None  # Python code object or MEL proc call
+        self._procName = None
+
+    def matches(self, language, cmd):
+        return language == self.language and cmd == self.cmd
+
+    def compile(self):
+        if self.language == 'mel':
+            # bodies defining their own procs can't be wrapped in one, and the
+            # global variables they declare must stay at the top level
+            if re.search(r'\b(proc|global)\b', self.source):
+                self._code = self.source
+            else:
+                # the other top level variables are local to the proc
+                if self._procName is None:
+                    self._procName = procName()
+                backend.runMel('global proc {}()\n{{\n{}\n}}'.format(self._procName, self.source))
+                self._code = '{}();'.format(self._procName)
+        else:
+            self._code = compile(self.source, '<nuPicker command>', 'exec')
+
+    def run(self, globals):
+        if self._code is None:
+            self.compile()
+        if self.language == 'mel':
+            backend.runMel(self._code)
+        else:
+            exec(self._code, globals)
+
+    def release(self):
+        '''
+        Give the MEL proc name back once the command is dropped.
+        '''
+        if self._procName is not None:
+            _freeProcNames.append(self._procName)
+            self._procName = None
+        self._code = None
+
+
+class CommandCache(object):
+    '''
+    Cache of (command button, namespace) -> compiled command.
+
+    Python commands all run in Maya's __main__ namespace, so pm, mc and the
+    user's own helpers are there, and what a command imports or defines is
+    still there on the next click.
+    An entry whose button changed its command since is compiled again.
+    '''
+    def __init__(self):
+        self._cache = {}  # (button, namespace): CompiledCommand
+        self._namespaces = {}  # button: set(namespace, ...)
+        self.globals = __main__.__dict__
+
+    def __len__(self):
+        return len(self._cache)
+
+    def get(self, button, namespace):
+        key = (button, namespace)
+        compiled = self._cache.get(key)
+        if compiled is None or not compiled.matches(button.language, button.cmd):
+            if compiled is not None:
+                compiled.release()
+            compiled = CompiledCommand(button.language, button.cmd, namespace)
+            self._cache[key] = compiled
+            self._namespaces.setdefault(button, set()).add(namespace)
+        return compiled
+
+    def run(self, button, namespace):
+        self.get(button, namespace).run(self.globals)
+
+    def invalidate(self, button):
+        for namespace in self._namespaces.pop(button, ()):
+            compiled = self._cache.pop((button, namespace), None)
+            if compiled is not None:
+                compiled.release()
+
+    def clear(self):
+        for compiled in self._cache.values():
+            compiled.release()
+        self._cache.clear()
+        self._namespaces.clear()
@@ -0,0 +1,326 @@
+# Background image decoding and caching for nuPicker.
+# Images are decoded and scaled into a QImage on a worker thread, the
+# QPixmap is only made on the main thread once the image is ready.
+# Decoded pixmaps are shared by every layout through a cache keyed by
+# the hash of the encoded image, so identical backgrounds decode once.
+# The encoded image is kept with its pixmap, it is what the layout saves.
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from PySide2 import QtCore, QtGui
+
+import npk
+import tasks
+
+CACHE_BUDGET = 128 * 1024 * 1024  # bytes of decoded pixmaps and their encoded images kept by the cache
+IMAGE_FORMATS = ('png', 'jpg', 'webp')  # formats a background can be saved as, webp needs the Qt plugin
+
+_pool = None
+_cache = None
+_receiver = None
+_pending = {}  # content key, or path key of a file not read yet: task being decoded
+_pathKeys = {}  # path key, (path, mtime, file size, scaled size): content key
+_writableFormats = None
+
+
+def threadPool():
+    '''
+    Thread pool for the decode tasks.
+    '''
+    global _pool
+    if _pool is None:
+        _pool = tasks.TaskPool(max(1, QtCore.QThread.idealThreadCount() - 1))
+    return _pool
+
+def cache():
+    '''
+    The pixmap cache shared by every layout.
+    '''
+    global _cache
+    if _cache is None:
+        _cache = PixmapCache(budget=CACHE_BUDGET)
+    return _cache
+
+def contentKey(data, size=None):
+    return hashlib.sha1(data).hexdigest(), size
+
+def readImage(path=None, data=None, size=None):
+    '''
+    Decode an image from a file path or encoded data, scaled to fit in
+    size x size keeping its aspect ratio.
+    Returns a null QImage if the image cannot be read.
+    '''
+    if path:
+        reader = QtGui.QImageReader(path)
+    else:
+        buff = QtCore.QBuffer()
+        buff.setData(data)
+        buff.open(QtCore.QIODevice.ReadOnly)
+        reader = QtGui.QImageReader(buff)
+
+    if size:
+        imgSize = reader.size()
+        if imgSize.isValid():
+            # let the reader scale while decoding, jpg skips most of the work
+            reader.setScaledSize(imgSize.scaled(size, size, QtCore.Qt.KeepAspectRatio))
+    return reader.read()
+
+def writableFormats():
+    '''
+    The IMAGE_FORMATS the Qt image plugins of this session can write.
+    '''
+    global _writableFormats
+    if _writableFormats is None:
+        supported = set(f.data().decode('ascii').lower() for f in QtGui.QImageWriter.supportedImageFormats())
+        _writableFormats = [f for f in IMAGE_FORMATS if f in supported]
+    return _writableFormats
+
+def encodeImage(data, format, quality=-1):
+    '''
+    Re-encode image data to format ('png', 'jpg' or 'webp'), quality is 0 to 100
+    for the lossy formats, -1 is the Qt default.
+    Data already in that format is returned as is, a lossy image is never
+    encoded again on top of itself. So is data that cannot be read.
+    Safe to call from a worker thread, only QImage is used.
+    '''
+    if not format or npk.imageFormat(data) == format:
+        return data
+    image = readImage(data=data)
+    if image.isNull():
+        return data
+    ba = QtCore.QByteArray()
+    buff = QtCore.QBuffer(ba)
+    buff.open(QtCore.QIODevice.WriteOnly)
+    writer = QtGui.QImageWriter(buff, format.encode('ascii'))
+    writer.setQuality(quality)
+    if format == 'png':
+        writer.setCompression(9)  # smallest file, png decoding speed doesn't depend on it
+    if not writer.write(image):
+        return data
+    return ba.data()
+
+
+class PixmapCache(object):
+    '''
+    LRU cache of decoded pixmaps and the encoded images they were decoded
+    from, with a budget in bytes.
+    Pixmaps still used by a layout stay alive when evicted, the cache
+    only drops its own reference.
+    '''
+    def __init__(self, budget=CACHE_BUDGET):
+        self._pixmaps = OrderedDict()  # key: pixmap, least recently used first
+        self._data = {}  # key: encoded image
+        self._costs = {}  # key: bytes
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._pixmaps)
+
+    def __contains__(self, key):
+        return key in self._pixmaps
+
+    def get(self, key):
+        pixmap = self._pixmaps.pop(key, None)
+        if pixmap is None:
+            self.misses += 1
+            return None
+        self._pixmaps[key] = pixmap  # most recently used
+        self.hits += 1
+        return pixmap
+
+    def data(self, key):
+        '''
+        Encoded image of a cached pixmap, None if it was inserted without.
+        '''
+        return self._data.get(key)
+
+    def insert(self, key, pixmap, data=None):
+        if key in self._pixmaps:
+            self.remove(key)
+        cost = pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+        if data:
+            cost += len(data)
+        if cost > self.budget:
+            return
+        self._pixmaps[key] = pixmap
+        self._data[key] = data
+        self._costs[key] = cost
+        self.size += cost
+        self.trim()
+
+    def remove(self, key):
+        if self._pixmaps.pop(key, None) is not None:
+            self._data.pop(key)
+            self.size -= self._costs.pop(key)
+
+    def setBudget(self, budget):
+        self.budget = budget
+        self.trim()
+
+    def trim(self):
+        while self.size > self.budget and self._pixmaps:
+            key = next(iter(self._pixmaps))
+            self.remove(key)
+            self.evictions += 1
+
+    def clear(self):
+        self._pixmaps.clear()
+        self._data.clear()
+        self._costs.clear()
+        self.size = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'count': len(self._pixmaps),
+                'bytes': self.size,
+                'budget': self.budget,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': float(self.hits) / lookups if lookups else 0.0,
+                'evictions': self.evictions}
+
+
+class DecodeSignals(QtCore.QObject):
+    finished = QtCore.Signal(object, QtGui.QImage)  # task, image
+
+
+class DecodeReceiver(QtCore.QObject):
+    '''
+    Lives on the main thread, the finished signals of the tasks are queued to it.
+    '''
+    @QtCore.Slot(object, QtGui.QImage)
+    def finished(self, task, image):
+        task.deliver()
+
+
+class DecodeTask(tasks.Task):
+    '''
+    Decode an image on a worker thread, shared by every layout waiting for it.
+    The image is encoded data, or a file that is read and hashed on the worker
+    thread too, key is then None until it is read.
+    Each callback(task, pixmap) is called on the main thread once the image
+    is ready, the pixmap is null if the image cannot be read. task.data is
+    the encoded image then.
+    The decode is cancelled once every layout waiting for it cancelled.
+    '''
+    Signals = DecodeSignals
+
+    def __init__(self, key, data=None, size=None, path=None, pathKey=None):
+        super(DecodeTask, self).__init__()
+        self.key = key
+        self.data = data
+        self.size = size
+        self.path = path
+        self.pathKey = pathKey
+        self.pendingKey = pathKey if key is None else key
+        self.image = None
+        self.pixmap = None
+        self.cancelled = False
+        self.callbacks = []
+        self._decoded = threading.Event()
+
+    def work(self):
+        if not self.cancelled:
+            try:
+                if self.data is None:
+                    self.data = readBytes(self.path)
+                    self.key = contentKey(self.data, self.size)
+                self.image = readImage(data=self.data, size=self.size)
+            except (IOError, OSError):
+                self.image = QtGui.QImage()
+        self._decoded.set()
+        if not self.cancelled:
+            self.signals.finished.emit(self, self.image)
+
+    def addCallback(self, callback):
+        self.callbacks.append(callback)
+
+    def cancel(self, callback=None):
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
+        if self.callbacks:
+            return
+        self.cancelled = True
+        if _pending.get(self.pendingKey) is self:
+            del _pending[self.pendingKey]
+        # not started yet, take it out of the queue. Otherwise, or on the builds
+        # older than Qt 5.9, the task runs and returns at once on the cancelled flag
+        if threadPool().tryTake(self):
+            self._decoded.set()
+
+    def wait(self):
+        '''
+        Block until the image is decoded and return the pixmap.
+        '''
+        self._decoded.wait()
+        return self.toPixmap()
+
+    def toPixmap(self):
+        # main thread only, the pixmap is made and cached once
+        if self.pixmap is None:
+            if _pending.get(self.pendingKey) is self:
+                del _pending[self.pendingKey]
+            if self.pathKey and self.key:
+                _pathKeys[self.pathKey] = self.key
+            self.pixmap = QtGui.QPixmap()
+            if self.image is not None and not self.image.isNull():
+                # the same image may have been decoded from other data meanwhile
+                cached = cache().get(self.key)
+                if cached is None:
+                    cached = QtGui.QPixmap.fromImage(self.image)
+                    cache().insert(self.key, cached, self.data)
+                self.pixmap = cached
+            self.image = None
+        return self.pixmap
+
+    def deliver(self):
+        pixmap = self.toPixmap()
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback(self, pixmap)
+
+def readBytes(path):
+    with open(path, 'rb') as handle:
+        return handle.read()
+
+def loadBackground(callback, path=None, data=None, size=None):
+    '''
+    Get the pixmap of an image file path or encoded data, scaled to fit
+    in size x size.
+    Returns (pixmap, data, None) when it is cached, data is the encoded image,
+    otherwise (None, None, task) and callback(task, pixmap) is called on this
+    thread when it is ready.
+    Layouts asking for the same image share the task.
+    A file is only stat'ed here, it is read and hashed on the worker thread,
+    the cache is looked up by path, mtime and file size.
+    '''
+    global _receiver
+    pathKey = None
+    if path:
+        stat = os.stat(path)
+        pathKey = (path, stat.st_mtime, stat.st_size, size)
+        key = _pathKeys.get(pathKey)
+    else:
+        key = contentKey(data, size)
+
+    pixmap = cache().get(key) if key else None
+    if pixmap is not None:
+        return pixmap, cache().data(key), None
+
+    task = _pending.get(key or pathKey)
+    if task is None:
+        if _receiver is None:
+            _receiver = DecodeReceiver()
+        task = DecodeTask(key, data, size=size, path=path, pathKey=pathKey)
+        task.signals.finished.connect(_receiver.finished)
+        _pending[task.pendingKey] = task
+        threadPool().start(task)
+    task.addCallback(callback)
+    return None, None, task
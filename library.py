@@ -0,0 +1,197 @@
+# Picker library index for nuPicker.
+# Keeps a summary of every layout file of a library directory in a local
+# index file, keyed by path and stamped with the file mtime and size, so
+# browsing the library only reads the files that changed since the last scan.
+
+import base64
+import json
+import os
+import threading
+
+from PySide2 import QtCore, QtGui
+
+import images
+import npk
+import tasks
+
+INDEX_VERSION = 1
+THUMBNAIL_SIZE = 128
+FILE_EXT = '.npk'
+
+
+def fileStamp(path):
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
+def makeThumbnail(background, size=THUMBNAIL_SIZE):
+    '''
+    Return a small PNG of a background image as base64 text, or '' if it cannot be read.
+    Safe to call from a worker thread, only QImage is used.
+    '''
+    if not background:
+        return ''
+    image = images.readImage(data=background, size=size)
+    if image.isNull():
+        return ''
+    ba = QtCore.QByteArray()
+    buff = QtCore.QBuffer(ba)
+    buff.open(QtCore.QIODevice.WriteOnly)
+    image.save(buff, 'PNG')
+    return base64.b64encode(ba.data()).decode('ascii')
+
+def readEntry(path):
+    '''
+    Read the index entry of a layout file. A file that cannot be parsed gets
+    an entry with its error, it never stops the scan of the other files.
+    '''
+    mtime, size = fileStamp(path)
+    with open(path, 'rb') as handle:
+        data = handle.read()
+    entry = {'mtime': mtime, 'size': size, 'error': ''}
+    try:
+        info, background = npk.loadsInfo(data)
+    except Exception as e:
+        error = str(e) if isinstance(e, npk.NpkError) else 'Unexpected error: {!r}'.format(e)
+        entry.update({'name': '', 'buttons': 0, 'commands': 0, 'namespaces': [],
+                    'version': 0, 'thumbnail': '', 'error': error})
+        return entry
+    entry.update(info)
+    entry['thumbnail'] = makeThumbnail(background)
+    return entry
+
+def thumbnailPixmap(entry):
+    '''
+    Main thread only, return the thumbnail of an entry as a pixmap (null if it has none).
+    '''
+    pixmap = QtGui.QPixmap()
+    if entry.get('thumbnail'):
+        pixmap.loadFromData(base64.b64decode(entry['thumbnail']), 'PNG')
+    return pixmap
+
+
+class LibraryIndex(object):
+    '''
+    On disk cache of layout file entries, {path: entry}.
+    An entry is valid as long as the file mtime and size match its stamps.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        entries = {}
+        try:
+            with open(self.path, 'r') as handle:
+                data = json.load(handle)
+            if data.get('version') == INDEX_VERSION:
+                entries = data.get('files', {})
+        except (IOError, OSError, ValueError):
+            pass
+        with self._lock:
+            self.entries = entries
+
+    def save(self):
+        with self._lock:
+            data = {'version': INDEX_VERSION, 'files': dict(self.entries)}
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        tmpPath = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmpPath, 'w') as handle:
+            json.dump(data, handle)
+        npk.replaceFile(tmpPath, self.path)
+
+    def get(self, path):
+        with self._lock:
+            return self.entries.get(path)
+
+    def update(self, path, entry):
+        with self._lock:
+            self.entries[path] = entry
+
+    def remove(self, path):
+        with self._lock:
+            self.entries.pop(path, None)
+
+    def entriesIn(self, directory):
+        '''
+        Return {path: entry} of the indexed files under a directory.
+        '''
+        directory = os.path.normpath(directory)
+        prefix = os.path.join(directory, '')
+        with self._lock:
+            return dict((p, e) for p, e in self.entries.items() if p.startswith(prefix))
+
+    def isCurrent(self, path, stamp):
+        entry = self.get(path)
+        return entry is not None and (entry['mtime'], entry['size']) == stamp
+
+
+class ScanSignals(QtCore.QObject):
+    entryUpdated = QtCore.Signal(str, object)  # path, entry
+    entryRemoved = QtCore.Signal(str)
+    finished = QtCore.Signal(object)  # task
+
+
+class ScanTask(tasks.Task):
+    '''
+    Rescan a library directory on a worker thread. Only the files whose
+    stamps changed are read, the index is saved once the scan is done.
+    '''
+    Signals = ScanSignals
+
+    def __init__(self, index, directory):
+        super(ScanTask, self).__init__()
+        self.index = index
+        self.directory = os.path.normpath(directory)
+        self.cancelled = False
+        self.read = 0  # number of files read
+
+    def work(self):
+        try:
+            self.scan()
+        finally:
+            if not self.cancelled:
+                self.signals.finished.emit(self)
+
+    def scan(self):
+        found = set()
+        for root, dirs, files in os.walk(self.directory):
+            for fileName in files:
+                if self.cancelled:
+                    return
+                if not fileName.lower().endswith(FILE_EXT):
+                    continue
+                path = os.path.join(root, fileName)
+                try:
+                    stamp = fileStamp(path)
+                except OSError:
+                    continue
+                found.add(path)
+                if self.index.isCurrent(path, stamp):
+                    continue
+                try:
+                    entry = readEntry(path)
+                except (IOError, OSError):
+                    continue
+                self.read += 1
+                self.index.update(path, entry)
+                if not self.cancelled:
+                    self.signals.entryUpdated.emit(path, entry)
+
+        if self.cancelled:
+            return
+        removed = [p for p in self.index.entriesIn(self.directory) if p not in found]
+        for path in removed:
+            self.index.remove(path)
+            self.signals.entryRemoved.emit(path)
+
+        if self.read or removed:
+            try:
+                self.index.save()
+            except (IOError, OSError):
+                pass  # the index stays up to date in memory
+
+    def cancel(self):
+        self.cancelled = True
@@ -0,0 +1,76 @@
+# Layout loading for nuPicker.
+# Files are read and parsed on a thread pool, several at once, and handed
+# back to the main thread one by one as they are ready. A file that fails
+# is reported on its own and doesn't hold the others back.
+
+from PySide2 import QtCore
+
+import npk
+import tasks
+
+MAX_THREADS = 4  # files read at the same time, the network share is the bottleneck
+
+
+class LoadSignals(QtCore.QObject):
+    finished = QtCore.Signal(object)  # task
+
+
+class LoadTask(tasks.Task):
+    '''
+    Read and parse one layout file. result is (name, buttons, background)
+    and compression the one of the file, or error is set if the file cannot be read.
+    '''
+    Signals = LoadSignals
+
+    def __init__(self, path):
+        super(LoadTask, self).__init__()
+        self.path = path
+        self.result = None
+        self.compression = ''
+        self.error = None
+
+    def work(self):
+        try:
+            with open(self.path, 'rb') as handle:
+                data = handle.read()
+            self.result = npk.loads(data)
+            self.compression = npk.compressionOf(data)
+        except (IOError, OSError, npk.NpkError) as e:
+            self.error = str(e)
+        except Exception as e:
+            self.error = 'Unexpected error: {}'.format(e)
+        self.signals.finished.emit(self)
+
+
+class Loader(QtCore.QObject):
+    '''
+    Reads layout files on a thread pool.
+        loaded(path, name, buttons, background, compression) and failed(path, message)
+        are emitted on the main thread, in the order the files are ready.
+    '''
+    loaded = QtCore.Signal(str, object, object, object, str)
+    failed = QtCore.Signal(str, str)
+
+    def __init__(self, parent=None):
+        super(Loader, self).__init__(parent)
+        self._pool = tasks.TaskPool(MAX_THREADS)
+
+    def load(self, paths):
+        started = []
+        for path in paths:
+            task = LoadTask(path)
+            task.signals.finished.connect(self.taskFinished)
+            started.append(self._pool.start(task))
+        return started
+
+    @QtCore.Slot(object)
+    def taskFinished(self, task):
+        if task.error:
+            self.failed.emit(task.path, task.error)
+        else:
+            name, buttons, background = task.result
+            task.result = None
+            self.loaded.emit(task.path, name, buttons, background, task.compression)
+
+    def isBusy(self):
+        return self._pool.isBusy()
@@ -0,0 +1,459 @@
+# .npk layout file format for nuPicker.
+# Pure Python with no Maya or Qt dependency, so layouts can be read and
+# written outside of Maya as well.
+#
+# v2 file, every number little-endian
+#   header      magic 'NUPK', version (uint16), flags (uint16), section count (uint32)
+#               flags tell how the STRS and BTNS payloads are compressed, FLAG_ZLIB or
+#               FLAG_LZMA. Compressed files are version 3, plain ones are still written
+#               as version 2 so older pickers keep reading them.
+#   sections    tag (4 bytes), size (uint32), payload
+#       STRS    string table, count (uint32), char length of each string (uint32 array),
+#               then all strings as one utf-8 blob. Index 0 is always ''.
+#       META    index of the layout name in the string table (uint32)
+#       BTNS    button count (uint32), then one typed array per column (see COLUMNS),
+#               then the flat object and UUID string indices of the pick buttons
+#       BGIM    background image file data, as is, never compressed again
+#   unknown sections are skipped, so newer files stay readable.
+#
+# Legacy files are pickled dicts, they are read through a restricted unpickler
+# that refuses to import anything, and are written back as v2.
+
+import array
+import io
+import os
+import pickle
+import struct
+import sys
+import zlib
+
+if os.name == 'nt':
+    import ctypes
+    from ctypes import wintypes
+    _kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    _kernel32.MoveFileExW.argtypes = (wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.DWORD)
+    _kernel32.MoveFileExW.restype = wintypes.BOOL
+    MOVEFILE_REPLACE_EXISTING = 0x1
+    MOVEFILE_WRITE_THROUGH = 0x8
+
+try:
+    import lzma
+except ImportError:  # Python 2
+    lzma = None
+
+MAGIC = b'NUPK'
+VERSION = 3
+PLAIN_VERSION = 2  # version of the files written without compression
+
+HEADER = struct.Struct('<4sHHI')
+SECTION = struct.Struct('<4sI')
+UINT = struct.Struct('<I')
+
+STRS, META, BTNS, BGIM = b'STRS', b'META', b'BTNS', b'BGIM'
+
+# header flags
+FLAG_ZLIB = 1
+FLAG_LZMA = 2
+COMPRESSIONS = (('', 0), ('zlib', FLAG_ZLIB), ('lzma', FLAG_LZMA))
+COMPRESSED_SECTIONS = (STRS, BTNS)
+ZLIB_LEVEL = 6
+
+# button kinds
+PICK_BUTTON = 0
+CMD_BUTTON = 1
+
+# button table columns, one typed array of button count items each
+COLUMNS = (('kind', 'B'),
+        ('x', 'd'),
+        ('y', 'd'),
+        ('scaleX', 'd'),
+        ('scaleY', 'd'),
+        ('opacity', 'd'),
+        ('red', 'B'),
+        ('green', 'B'),
+        ('blue', 'B'),
+        ('label', 'I'),
+        ('language', 'I'),  # command buttons only, 0 otherwise
+        ('cmd', 'I'),  # command buttons only, 0 otherwise
+        ('objCount', 'I'))
+
+LANGUAGES = ('mel', 'python')
+
+# the only globals a legacy pickle may refer to
+LEGACY_GLOBALS = {('_codecs', 'encode'),
+                ('__builtin__', 'bytearray'), ('builtins', 'bytearray'),
+                ('__builtin__', 'set'), ('builtins', 'set')}
+
+_BIG_ENDIAN = sys.byteorder == 'big'
+if array.array('I').itemsize != 4:  # 'I' is 4 bytes on every platform Maya runs on
+    raise ImportError('npk needs a 4 bytes unsigned int array type')
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+
+class NpkError(ValueError):
+    '''
+    Raised when a file is not a valid .npk layout.
+    '''
+
+
+#### arrays
+def _arrayBytes(values):
+    if _BIG_ENDIAN:
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    try:
+        return values.tobytes()
+    except AttributeError:  # Python 2
+        return values.tostring()
+
+def _arrayFrom(typecode, data, start, count):
+    values = array.array(typecode)
+    end = start + values.itemsize * count
+    if end > len(data):
+        raise NpkError('Truncated button table')
+    chunk = data[start:end]
+    try:
+        values.frombytes(chunk)
+    except AttributeError:  # Python 2
+        values.fromstring(chunk)
+    if _BIG_ENDIAN:
+        values.byteswap()
+    return values, end
+
+#### strings
+class StringTable(object):
+    '''
+    Interned strings, each distinct string is stored once and referred to by index.
+    '''
+    def __init__(self):
+        self.strings = ['']
+        self._indices = {'': 0}
+
+    def add(self, string):
+        string = _text(string)
+        index = self._indices.get(string)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(string)
+            self._indices[string] = index
+        return index
+
+    def dump(self):
+        lengths = array.array('I', [len(s) for s in self.strings])
+        blob = u''.join(self.strings).encode('utf-8')
+        return UINT.pack(len(self.strings)) + _arrayBytes(lengths) + blob
+
+    @staticmethod
+    def load(data):
+        if len(data) < UINT.size:
+            raise NpkError('Truncated string table')
+        count = UINT.unpack_from(data)[0]
+        lengths, start = _arrayFrom('I', data, UINT.size, count)
+        try:
+            text = data[start:].decode('utf-8')
+        except UnicodeDecodeError:
+            raise NpkError('Invalid string table')
+        strings = []
+        i = 0
+        for length in lengths:
+            strings.append(text[i:i+length])
+            i += length
+        return strings
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return text_type(value)
+
+#### compression
+def availableCompressions():
+    '''
+    Compressions this Python can write, '' is no compression.
+    '''
+    return [name for name, _ in COMPRESSIONS if name != 'lzma' or lzma]
+
+def _compress(data, compression):
+    if compression == 'zlib':
+        return zlib.compress(data, ZLIB_LEVEL)
+    if compression == 'lzma':
+        return lzma.compress(data)
+    return data
+
+def _decompress(data, flags):
+    if flags == FLAG_LZMA and lzma is None:
+        raise NpkError('File is lzma compressed, this Python cannot read it')
+    errors = (zlib.error, lzma.LZMAError, EOFError) if lzma else (zlib.error,)
+    try:
+        if flags == FLAG_ZLIB:
+            return zlib.decompress(data)
+        return lzma.decompress(data)
+    except errors as e:
+        raise NpkError('Corrupted compressed section: {}'.format(e))
+
+def compressionOf(data):
+    '''
+    Return the compression of file data, '' when it is not compressed or not a v2 file.
+    '''
+    if not data.startswith(MAGIC) or len(data) < HEADER.size:
+        return ''
+    flags = HEADER.unpack_from(data)[2]
+    for name, flag in COMPRESSIONS:
+        if flag == flags:
+            return name
+    return ''
+
+#### write
+def dumps(name, buttons, background=None, compression=''):
+    '''
+    Return the v2 file data of a layout.
+        name: layout name
+        buttons: [[label, size, opacity, color, exe, uuids, pos], ...]
+            exe is the list of bound objects for pick buttons,
+            or '<mel>cmd' / '<python>cmd' for command buttons
+        background: image file data, or None
+        compression: '', 'zlib' or 'lzma', see availableCompressions
+    '''
+    flags = dict(COMPRESSIONS).get(compression)
+    if flags is None or compression not in availableCompressions():
+        raise ValueError('Unknown or unavailable compression: {}'.format(compression))
+
+    strings = StringTable()
+    columns = dict((column, array.array(typecode)) for column, typecode in COLUMNS)
+    objs = array.array('I')
+    uuids = array.array('I')
+
+    for label, size, opacity, color, exe, btnUuids, pos in buttons:
+        columns['x'].append(pos[0])
+        columns['y'].append(pos[1])
+        columns['scaleX'].append(size[0])
+        columns['scaleY'].append(size[1])
+        columns['opacity'].append(opacity)
+        columns['red'].append(color[0])
+        columns['green'].append(color[1])
+        columns['blue'].append(color[2])
+        columns['label'].append(strings.add(label))
+        if isinstance(exe, list):
+            columns['kind'].append(PICK_BUTTON)
+            columns['language'].append(0)
+            columns['cmd'].append(0)
+            columns['objCount'].append(len(exe))
+            btnUuids = btnUuids or []
+            for i, obj in enumerate(exe):
+                objs.append(strings.add(obj))
+                uuids.append(strings.add(btnUuids[i] or '') if i < len(btnUuids) else 0)
+        else:
+            language, cmd = splitCommand(exe)
+            columns['kind'].append(CMD_BUTTON)
+            columns['language'].append(strings.add(language))
+            columns['cmd'].append(strings.add(cmd))
+            columns['objCount'].append(0)
+
+    nameIndex = strings.add(name or '')
+    table = [UINT.pack(len(buttons))]
+    table.extend(_arrayBytes(columns[column]) for column, _ in COLUMNS)
+    table.append(_arrayBytes(objs))
+    table.append(_arrayBytes(uuids))
+
+    sections = [(STRS, strings.dump()),
+                (META, UINT.pack(nameIndex)),
+                (BTNS, b''.join(table))]
+    if background:
+        sections.append((BGIM, bytes(background)))
+
+    out = [HEADER.pack(MAGIC, VERSION if flags else PLAIN_VERSION, flags, len(sections))]
+    for tag, payload in sections:
+        if flags and tag in COMPRESSED_SECTIONS:
+            payload = _compress(payload, compression)
+        out.append(SECTION.pack(tag, len(payload)))
+        out.append(payload)
+    return b''.join(out)
+
+def write(path, name, buttons, background=None, compression=''):
+    '''
+    Write a layout file. The data goes to a temp file next to the target
+    that is then renamed over it, so the target is never left truncated.
+    '''
+    data = dumps(name, buttons, background, compression=compression)
+    tmpPath = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(tmpPath, 'wb') as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        replaceFile(tmpPath, path)
+    except:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+
+def replaceFile(src, dst):
+    '''
+    Rename src over dst atomically, dst is never missing even if the process
+    dies halfway. On Windows the rename is written through before returning.
+    '''
+    if os.name == 'nt':
+        # os.rename doesn't overwrite on Windows and Python 2 has no os.replace
+        if not _kernel32.MoveFileExW(_text(src), _text(dst), MOVEFILE_REPLACE_EXISTING | MOVEFILE_WRITE_THROUGH):
+            raise ctypes.WinError(ctypes.get_last_error())
+    else:
+        os.rename(src, dst)  # replaces dst atomically on POSIX
+
+#### read
+def loads(data):
+    '''
+    Read file data, v2 or legacy.
+    Returns (name, buttons, background), see dumps.
+    '''
+    if not data.startswith(MAGIC):
+        return loadsLegacy(data)
+
+    if len(data) < HEADER.size:
+        raise NpkError('Truncated header')
+    magic, version, flags, count = HEADER.unpack_from(data)
+    if version > VERSION:
+        raise NpkError('File version {} is newer than this picker (version {})'.format(version, VERSION))
+    if flags not in dict(COMPRESSIONS).values():
+        raise NpkError('Unknown file flags: {}'.format(flags))
+
+    sections = {}
+    offset = HEADER.size
+    for _ in range(count):
+        if offset + SECTION.size > len(data):
+            raise NpkError('Truncated section header')
+        tag, size = SECTION.unpack_from(data, offset)
+        offset += SECTION.size
+        if offset + size > len(data):
+            raise NpkError('Truncated section {}'.format(tag))
+        sections[tag] = data[offset:offset+size]
+        if flags and tag in COMPRESSED_SECTIONS:
+            sections[tag] = _decompress(sections[tag], flags)
+        offset += size
+
+    strings = StringTable.load(sections.get(STRS, UINT.pack(0)))
+    try:
+        name = strings[UINT.unpack_from(sections[META])[0]] if META in sections else ''
+        buttons = _loadButtons(sections[BTNS], strings) if BTNS in sections else []
+    except (IndexError, struct.error):
+        raise NpkError('Invalid string index')
+    return name, buttons, sections.get(BGIM)
+
+def _loadButtons(data, strings):
+    count = UINT.unpack_from(data)[0]
+    offset = UINT.size
+    columns = {}
+    for column, typecode in COLUMNS:
+        columns[column], offset = _arrayFrom(typecode, data, offset, count)
+    objCount = sum(columns['objCount'])
+    objs, offset = _arrayFrom('I', data, offset, objCount)
+    uuids, offset = _arrayFrom('I', data, offset, objCount)
+
+    buttons = []
+    objIndex = 0
+    rows = zip(*[columns[column] for column, _ in COLUMNS])
+    for kind, x, y, scaleX, scaleY, opacity, red, green, blue, label, language, cmd, num in rows:
+        if kind == PICK_BUTTON:
+            end = objIndex + num
+            exe = [strings[i] for i in objs[objIndex:end]]
+            btnUuids = [strings[i] or None for i in uuids[objIndex:end]]
+            objIndex = end
+        else:
+            exe = u'<{}>{}'.format(strings[language], strings[cmd])
+            btnUuids = []
+        buttons.append([strings[label], [scaleX, scaleY], opacity, [red, green, blue], exe, btnUuids, (x, y)])
+    return buttons
+
+def read(path):
+    with open(path, 'rb') as handle:
+        return loads(handle.read())
+
+def loadsInfo(data):
+    '''
+    Read the summary of a layout from file data, v2 or legacy.
+    Returns (info, background), info is a dict with
+        name, buttons (pick button count), commands (command button count),
+        namespaces (sorted namespaces found in the bound objects), version
+    '''
+    name, buttons, background = loads(data)
+    pickCount = 0
+    namespaces = set()
+    for button in buttons:
+        exe = button[4]
+        if not isinstance(exe, list):
+            continue
+        pickCount += 1
+        for obj in exe:
+            for part in obj.split('|'):
+                if ':' in part:
+                    namespaces.add(part.rpartition(':')[0])
+    info = {'name': name,
+            'buttons': pickCount,
+            'commands': len(buttons) - pickCount,
+            'namespaces': sorted(namespaces),
+            'version': HEADER.unpack_from(data)[1] if data.startswith(MAGIC) else 1}
+    return info, background
+
+def imageFormat(data):
+    '''
+    Return 'png', 'jpg' or 'webp' from the first bytes of image data, '' for anything else.
+    '''
+    if data.startswith(b'\x89PNG'):
+        return 'png'
+    if data.startswith(b'\xff\xd8'):
+        return 'jpg'
+    if data.startswith(b'RIFF') and data[8:12] == b'WEBP':
+        return 'webp'
+    return ''
+
+def splitCommand(exe):
+    '''
+    Split '<mel>cmd' or '<python>cmd' into (language, cmd).
+    '''
+    for language in LANGUAGES:
+        tag = '<{}>'.format(language)
+        if exe.startswith(tag):
+            return language, exe[len(tag):]
+    return 'mel', exe
+
+#### legacy
+class _LegacyUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if (module, name) not in LEGACY_GLOBALS:
+            raise NpkError('Legacy file refers to {}.{}, refusing to load it'.format(module, name))
+        return pickle.Unpickler.find_class(self, module, name)
+
+def loadsLegacy(data):
+    '''
+    Read a legacy pickled layout without running any code from it.
+    Returns (name, buttons, background), see dumps.
+    '''
+    try:
+        unpickler = _LegacyUnpickler(io.BytesIO(data), encoding='latin1')
+    except TypeError:  # Python 2
+        unpickler = _LegacyUnpickler(io.BytesIO(data))
+    try:
+        data = unpickler.load()
+    except NpkError:
+        raise
+    except Exception as e:
+        raise NpkError('Not a layout file: {}'.format(e))
+    if not isinstance(data, dict):
+        raise NpkError('Not a layout file')
+
+    name = data.pop('name', '')
+    background = data.pop('bg', None)
+    # Python 2 byte strings come back as latin-1 text
+    if isinstance(background, text_type):
+        background = background.encode('latin1')
+
+    buttons = []
+    for pos, value in data.items():
+        if not isinstance(pos, tuple) or not isinstance(value, (list, tuple)) or len(value) < 5:
+            raise NpkError('Not a layout file: invalid button {!r}'.format(pos))
+        value = list(value)
+        uuids = value[5] if len(value) > 5 else []  # files saved before UUID binding
+        buttons.append(value[:5] + [uuids, pos])
+    return name, buttons, background
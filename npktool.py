@@ -0,0 +1,257 @@
+# Command line tool for nuPicker layout files.
+# Inspects, validates and converts .npk files outside of Maya, with no Qt,
+# spreading the files of a library over a process pool.
+#
+#   python npktool.py inspect P:/Library/GeneralLibrary/picker
+#   python npktool.py validate -j 8 layouts/
+#   python npktool.py convert --compression zlib --output migrated/ layouts/
+#
+# Directories are searched recursively for .npk files. The exit code is 1
+# when a file has errors, 0 otherwise.
+
+from __future__ import print_function
+
+import argparse
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+import npk
+
+FILE_EXT = '.npk'
+
+# result status, worst last
+OK = 'ok'
+WARNING = 'warning'
+ERROR = 'error'
+STATUSES = (OK, WARNING, ERROR)
+
+
+#### files
+def findFiles(paths):
+    '''
+    Return the .npk files of paths, directories are searched recursively.
+    '''
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    if name.lower().endswith(FILE_EXT):
+                        files.append(os.path.join(root, name))
+        else:
+            files.append(path)
+    return files
+
+def outputPath(path, output, roots):
+    '''
+    Path of the converted file in the output directory, relative to the
+    directory given on the command line the file was found in.
+    '''
+    if not output:
+        return path
+    path = os.path.abspath(path)
+    for root in roots:
+        root = os.path.abspath(root)
+        if os.path.isdir(root) and path.startswith(os.path.join(root, '')):
+            return os.path.join(output, os.path.relpath(path, root))
+    return os.path.join(output, os.path.basename(path))
+
+#### checks
+def checkButtons(buttons):
+    '''
+    Return (errors, warnings) found in the button data of a layout.
+    '''
+    errors = []
+    warnings = []
+    emptyPick = 0
+    emptyCmd = 0
+    for i, (label, size, opacity, color, exe, uuids, pos) in enumerate(buttons):
+        numbers = list(pos) + list(size) + [opacity]
+        if not all(isinstance(n, (int, float)) and not math.isnan(n) and not math.isinf(n) for n in numbers):
+            errors.append('button {} has an invalid position, size or opacity'.format(i))
+        if len(color) < 3 or not all(isinstance(c, int) and 0 <= c <= 255 for c in color[:3]):
+            errors.append('button {} has an invalid color {}'.format(i, color))
+        if isinstance(exe, list):
+            if not exe:
+                emptyPick += 1
+            if uuids and len(uuids) != len(exe):
+                warnings.append('button {} has {} objects but {} UUIDs'.format(i, len(exe), len(uuids)))
+        elif not npk.splitCommand(exe)[1].strip():
+            emptyCmd += 1
+    if emptyPick:
+        warnings.append('{} pick buttons are not bound to any object'.format(emptyPick))
+    if emptyCmd:
+        warnings.append('{} command buttons have no command'.format(emptyCmd))
+    return errors, warnings
+
+def inspectData(data):
+    '''
+    Summary of file data, the loadsInfo one plus the header and background details.
+    '''
+    info, background = npk.loadsInfo(data)
+    info['compression'] = npk.compressionOf(data)
+    info['fileSize'] = len(data)
+    info['background'] = (npk.imageFormat(background) or 'unknown') if background else ''
+    info['backgroundSize'] = len(background) if background else 0
+    return info
+
+#### jobs, run in the worker processes
+def runJob(job):
+    '''
+    Process one file, job is (action, path, options).
+    Returns a result dict with path, status, messages, info, seconds and
+    the input and output sizes.
+    '''
+    action, path, options = job
+    start = time.time()
+    result = {'path': path, 'status': OK, 'messages': [], 'info': {},
+            'sizeIn': 0, 'sizeOut': 0, 'seconds': 0.0}
+    try:
+        with open(path, 'rb') as handle:
+            data = handle.read()
+        result['sizeIn'] = len(data)
+        name, buttons, background = npk.loads(data)
+        result['info'] = inspectData(data)
+
+        errors, warnings = checkButtons(buttons)
+        if result['info']['version'] == 1:
+            warnings.append('legacy pickle file')
+        if background and not npk.imageFormat(background):
+            warnings.append('background image format is not png, jpg or webp')
+        if action != 'inspect':
+            result['messages'].extend(errors + warnings)
+            result['status'] = ERROR if errors else WARNING if warnings else OK
+
+        if action == 'convert' and not errors:
+            out = npk.dumps(name, buttons, background, compression=options['compression'])
+            result['sizeOut'] = len(out)
+            target = options['target']
+            if options['dryRun']:
+                pass
+            elif out == data and target == path:
+                result['messages'].append('unchanged')
+            else:
+                folder = os.path.dirname(target)
+                if folder and not os.path.exists(folder):
+                    try:
+                        os.makedirs(folder)
+                    except OSError:  # made by another worker in the meantime
+                        if not os.path.isdir(folder):
+                            raise
+                npk.write(target, name, buttons, background, compression=options['compression'])
+                if target != path:
+                    result['messages'].append('written to {}'.format(target))
+    except (IOError, OSError, npk.NpkError, ValueError) as e:
+        result['status'] = ERROR
+        result['messages'].append(str(e))
+    except Exception as e:
+        result['status'] = ERROR
+        result['messages'].append('Unexpected error: {!r}'.format(e))
+    result['seconds'] = time.time() - start
+    return result
+
+#### report
+def formatSize(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return '{:.0f} {}'.format(size, unit) if unit == 'B' else '{:.1f} {}'.format(size, unit)
+        size /= 1024.0
+    return '{:.1f} GB'.format(size)
+
+def printResult(action, result, verbose):
+    info = result['info']
+    line = '{:<7} {:>8.1f} ms  {}'.format(result['status'], result['seconds'] * 1000, result['path'])
+    if info:
+        line += '  [v{} {} {}b {}c'.format(info['version'], info['compression'] or 'raw',
+                                        info['buttons'], info['commands'])
+        if info['background']:
+            line += ' {} {}'.format(info['background'], formatSize(info['backgroundSize']))
+        line += ' {}]'.format(formatSize(result['sizeIn']))
+    if action == 'convert' and result['sizeOut']:
+        line += ' -> {}'.format(formatSize(result['sizeOut']))
+    print(line)
+    if action == 'inspect' and info and (verbose or info['name']):
+        print('        name: {}'.format(info['name']))
+        if info['namespaces']:
+            print('        namespaces: {}'.format(', '.join(info['namespaces'])))
+    for message in result['messages']:
+        print('        {}'.format(message))
+
+def printTotals(action, results, wallTime, jobs):
+    counts = dict((status, 0) for status in STATUSES)
+    for result in results:
+        counts[result['status']] += 1
+    workTime = sum(r['seconds'] for r in results)
+    sizeIn = sum(r['sizeIn'] for r in results)
+    print('')
+    print('{} files: {} ok, {} with warnings, {} with errors'.format(
+        len(results), counts[OK], counts[WARNING], counts[ERROR]))
+    print('read {}'.format(formatSize(sizeIn)), end='')
+    if action == 'convert':
+        sizeOut = sum(r['sizeOut'] for r in results)
+        print(', converted to {}'.format(formatSize(sizeOut)), end='')
+    print('')
+    print('{:.2f} s wall time, {:.2f} s of work over {} processes'.format(wallTime, workTime, jobs))
+    if results:
+        slowest = max(results, key=lambda r: r['seconds'])
+        print('slowest: {:.1f} ms {}'.format(slowest['seconds'] * 1000, slowest['path']))
+
+#### main
+def parseArgs(args):
+    parser = argparse.ArgumentParser(description='Inspect, validate and convert nuPicker .npk layout files.')
+    parser.add_argument('action', choices=('inspect', 'validate', 'convert'))
+    parser.add_argument('paths', nargs='+', help='.npk files or directories searched recursively')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='number of processes, the CPU count by default')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print the details of every file')
+    parser.add_argument('-q', '--quiet', action='store_true', help='only print the files with problems')
+    parser.add_argument('--compression', default='', choices=npk.availableCompressions(),
+                        help='convert: compression of the button payload, none by default')
+    parser.add_argument('--output', default='',
+                        help='convert: directory the files are written to, in place by default')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='convert: report the converted sizes without writing anything')
+    return parser.parse_args(args)
+
+def main(args=None):
+    options = parseArgs(sys.argv[1:] if args is None else args)
+    files = findFiles(options.paths)
+    if not files:
+        print('No {} files found'.format(FILE_EXT))
+        return 1
+
+    jobs = []
+    for path in files:
+        jobOptions = {'compression': options.compression,
+                    'dryRun': options.dry_run,
+                    'target': outputPath(path, options.output, options.paths)}
+        jobs.append((options.action, path, jobOptions))
+
+    processes = max(1, min(options.jobs or multiprocessing.cpu_count(), len(jobs)))
+    start = time.time()
+    results = []
+    if processes == 1:
+        mapped = (runJob(job) for job in jobs)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes)
+        mapped = pool.imap_unordered(runJob, jobs)
+    try:
+        for result in mapped:
+            results.append(result)
+            if not options.quiet or result['status'] != OK:
+                printResult(options.action, result, options.verbose)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    printTotals(options.action, results, time.time() - start, processes)
+    return 1 if any(r['status'] == ERROR for r in results) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# Name resolution cache for nuPicker.
+# Resolves the objects bound to picker buttons to Maya node names and keeps
+# the results until a Maya message says a node that could change them has
+# been added, removed, renamed or reparented.
+
+import backend
+import sync
+
+
+class NameResolver(object):
+    '''
+    Cache of (namespace, stored path, uuid) -> resolved node name.
+    Misses are cached too (as None).
+
+    Every entry is indexed by the node names found in its query and in its
+    result, so a node message only drops the entries that mention that node.
+    '''
+    def __init__(self):
+        self._cache = {}  # (namespace, path, uuid): node name or None
+        self._index = {}  # node short name: set(key, ...)
+        self._callbackIDs = []
+        self._nodeCallbackIDs = []
+        self._fileDepth = 0  # file operations in progress, the node callbacks are off during them
+
+    def __len__(self):
+        return len(self._cache)
+
+    def resolve(self, namespace, path, uuid=None):
+        return self.resolveMany(namespace, [(path, uuid)])[0]
+
+    def resolveMany(self, namespace, objs):
+        '''
+        Resolve a list of (path, uuid). Everything missing from the cache is
+        looked up together with a few bulk queries.
+        Returns the node names in the same order, None where not found.
+        '''
+        keys = [(namespace, path, uuid) for path, uuid in objs]
+        missing = [key for key in set(keys) if key not in self._cache]
+        if missing:
+            names, nodes = self._lookup(namespace, missing)
+            for key, name, node in zip(missing, names, nodes):
+                self._store(key, name, node)
+        return [self._cache[key] for key in keys]
+
+    def invalidate(self, name):
+        '''
+        Drop every entry that mentions the node, name can be a short name or a path.
+        '''
+        name = name.split('|')[-1]
+        keys = self._index.pop(name, None)
+        if not keys:
+            return
+        for key in keys:
+            self._cache.pop(key, None)
+
+    def clear(self):
+        self._cache.clear()
+        self._index.clear()
+
+    def _store(self, key, name, node):
+        self._cache[key] = node
+        for part in name.split('|'):
+            self._index.setdefault(part, set()).add(key)
+        if node:
+            for part in node.split('|'):
+                if part:
+                    self._index.setdefault(part, set()).add(key)
+
+    def _lookup(self, namespace, keys):
+        ns = '|{}'.format(namespace)
+        names = ['{}{}'.format(namespace, path.replace('|', ns)) for _, path, _ in keys]
+        nodes = [None] * len(keys)
+
+        # direct lookup with the UUIDs, every reference of a file shares
+        # the same UUIDs so pick the node in the namespace
+        uuids = list(set(key[2] for key in keys if key[2]))
+        if uuids:
+            uuidNodes = {}
+            for uuid, found in backend.nodesFromUuids(uuids).items():
+                for node in found:
+                    if sync.inNamespace(node.split('|')[-1], namespace):
+                        uuidNodes[uuid] = node
+                        break
+            for i, key in enumerate(keys):
+                if key[2]:
+                    nodes[i] = uuidNodes.get(key[2])
+
+        # path is the fallback, a name exists if an existing long name ends with it
+        todo = [i for i in range(len(keys)) if nodes[i] is None]
+        if todo:
+            existing = set()
+            for node in backend.longNames(list(set(names[i] for i in todo))):
+                parts = node.lstrip('|').split('|')
+                for j in range(len(parts)):
+                    existing.add('|'.join(parts[j:]))
+            for i in todo:
+                if names[i] in existing:
+                    nodes[i] = names[i]
+
+        # then short names, when only one node has it
+        todo = [i for i in todo if nodes[i] is None]
+        if todo:
+            shortNames = [names[i].split('|')[-1] for i in todo]
+            counts = {}
+            for node in backend.longNames(list(set(shortNames))):
+                shortName = node.split('|')[-1]
+                counts[shortName] = counts.get(shortName, 0) + 1
+            for i, shortName in zip(todo, shortNames):
+                if counts.get(shortName) == 1:
+                    nodes[i] = shortName
+
+        return names, nodes
+
+    #### maya messages
+    def createCallbacks(self):
+        '''
+        Watch the node messages, except while a scene is opened or cleared and
+        while a reference is created, loaded, imported, unloaded or removed:
+        each node of the file would send its message, the cache is cleared
+        once after the file instead.
+        '''
+        self.killCallbacks()
+        for before, after in backend.SCENE_MESSAGES:
+            self._callbackIDs.append(backend.addSceneCallback(before, self.fileStarted))
+            self._callbackIDs.append(backend.addSceneCallback(after, self.sceneDone))
+        for before, after in backend.REFERENCE_MESSAGES:
+            self._callbackIDs.append(backend.addSceneCallback(before, self.fileStarted))
+            self._callbackIDs.append(backend.addSceneCallback(after, self.fileDone))
+        self._fileDepth = 0
+        self.createNodeCallbacks()
+
+    def createNodeCallbacks(self):
+        if self._nodeCallbackIDs:
+            return
+        self._nodeCallbackIDs = backend.addNodeCallbacks(added=self.invalidate,
+                                                        removed=self.invalidate,
+                                                        renamed=self.nodeRenamed,
+                                                        reparented=self.invalidate)
+
+    def killNodeCallbacks(self):
+        backend.removeCallbacks(self._nodeCallbackIDs)
+        self._nodeCallbackIDs = []
+
+    def killCallbacks(self):
+        backend.removeCallbacks(self._callbackIDs)
+        self._callbackIDs = []
+        self.killNodeCallbacks()
+
+    def nodeRenamed(self, name, prevName):
+        if prevName:
+            self.invalidate(prevName)
+        self.invalidate(name)
+
+    def fileStarted(self, *args):
+        # a scene brings its references, they nest
+        self._fileDepth += 1
+        self.killNodeCallbacks()
+
+    def fileDone(self, *args):
+        self._fileDepth = max(0, self._fileDepth - 1)
+        if self._fileDepth:
+            return
+        self.clear()
+        self.createNodeCallbacks()
+
+    def sceneDone(self, *args):
+        # whatever did not finish in the previous scene is over too
+        self._fileDepth = 1
+        self.fileDone()
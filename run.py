@@ -1,32 +1,80 @@
 import sys
+import time
 from importlib import *
 
 from PySide2 import QtCore, QtWidgets
-from shiboken2 import wrapInstance
+from shiboken2 import wrapInstance, isValid
 
 import maya.cmds as mc
 
 import app
-reload(app)
 
 
 
-def mayaRun(debug=False):
+def reloadModules():
+    '''
+        Reload the package modules, dependencies before the modules using them.
+        Dev mode only, a normal run keeps the modules already imported.
+    '''
+    import backend, sync, resolver, command, npk, tasks, images, saver, loader, library, ui
+    for module in (backend, sync, resolver, command, npk, tasks, images, saver, loader, library, ui, app):
+        reload(module)
+
+# warm start
+_warmApp = None  # app kept alive hidden between runs
+_warmParent = None  # pointer of the Qt parent the warm app was built with
+
+def canReuse(parentPtr):
+    '''
+        Return True if the warm app can be shown again as is. It is rebuilt
+        when its window is gone, its Qt parent changed or a scene was opened
+        while it was hidden.
+    '''
+    if _warmApp is None or _warmParent != parentPtr:
+        return False
+    if not isValid(_warmApp.ui):
+        return False
+    return not _warmApp.sceneChangedWhileHidden
+
+def mayaRun(debug=False, warm=True):
     '''
         Run the app in Maya
+        debug: dev mode, reload the package modules first
+        warm: reuse the app from the previous run if nothing it depends on changed,
+            closing the window then only hides it
     '''
     import maya.OpenMayaUI as omui
+    global _warmApp, _warmParent
+
+    startTime = time.time()
+    if debug:
+        reloadModules()
+
+    ptr = long(omui.MQtUtil.mainWindow())
+    if warm and not debug and canReuse(ptr):
+        _warmApp.reshow()
+        return _warmApp
 
+    # drop the previous app, its callbacks may outlive a hidden window
+    if _warmApp is not None:
+        _warmApp.killJob()
+        _warmApp.killSceneJobs()
+        _warmApp = None
     if mc.window(app.UI_WIN_NAME, q=True, ex=True):
         mc.deleteUI(app.UI_WIN_NAME, window=True)
     
-    ptr = omui.MQtUtil.mainWindow()
-    NuPickerApp = app.NuPicker(parent=wrapInstance(long(ptr), QtWidgets.QWidget))
+    NuPickerApp = app.NuPicker(parent=wrapInstance(ptr, QtWidgets.QWidget), startTime=startTime)
+    NuPickerApp.keepAlive = warm
+    if warm:
+        _warmApp, _warmParent = NuPickerApp, ptr
 
     return NuPickerApp
 
 '''
 from nuTools.util.nuPicker import run as nuPicker_run
-reload(nuPicker_run)
 nuPicker_run.mayaRun()
+
+# dev mode
+reload(nuPicker_run)
+nuPicker_run.mayaRun(debug=True)
 '''
\ No newline at end of file
@@ -0,0 +1,89 @@
+# Layout saving for nuPicker.
+# A save only takes a snapshot of the layout on the main thread, the file
+# is serialized and written on a worker thread, through a temp file renamed
+# over the target so a crash never leaves a truncated layout behind.
+# Re-encoding the background to another image format happens there too.
+
+from PySide2 import QtCore
+
+import images
+import npk
+import tasks
+
+
+class SaveSignals(QtCore.QObject):
+    finished = QtCore.Signal(object, object)  # task, error message or None
+
+
+class SaveTask(tasks.Task):
+    '''
+    Serialize and write one layout snapshot.
+        imageFormat: '' keeps the background data as is, or 'png', 'jpg', 'webp'
+        quality: quality of the lossy image formats, 0 to 100, -1 is the Qt default
+        compression: compression of the button payload, see npk.availableCompressions
+        tag: anything the caller wants to find on the task once it is written
+    '''
+    Signals = SaveSignals
+
+    def __init__(self, path, name, buttons, background=None, autosave=False,
+                imageFormat='', quality=-1, compression='', tag=None):
+        super(SaveTask, self).__init__()
+        self.path = path
+        self.name = name
+        self.buttons = buttons
+        self.background = background
+        self.autosave = autosave
+        self.imageFormat = imageFormat
+        self.quality = quality
+        self.compression = compression
+        self.tag = tag
+        self.encoded = None  # background as written, once the task is done
+
+    def work(self):
+        error = None
+        try:
+            background = self.background
+            if background and self.imageFormat:
+                background = images.encodeImage(background, self.imageFormat, self.quality)
+            npk.write(self.path, self.name, self.buttons, background=background,
+                    compression=self.compression)
+            self.encoded = background
+        except Exception as e:
+            error = str(e)
+        self.signals.finished.emit(self, error)
+
+
+class Saver(QtCore.QObject):
+    '''
+    Writes layout snapshots one after the other on a worker thread.
+        saved(task) and failed(task, message) are emitted on the main thread.
+    '''
+    saved = QtCore.Signal(object)
+    failed = QtCore.Signal(object, str)
+
+    def __init__(self, parent=None):
+        super(Saver, self).__init__(parent)
+        self._pool = tasks.TaskPool(1)  # one thread keeps the writes in order
+
+    def save(self, path, name, buttons, background=None, autosave=False,
+            imageFormat='', quality=-1, compression='', tag=None):
+        task = SaveTask(path, name, buttons, background=background, autosave=autosave,
+                        imageFormat=imageFormat, quality=quality, compression=compression, tag=tag)
+        task.signals.finished.connect(self.taskFinished)
+        return self._pool.start(task)
+
+    @QtCore.Slot(object, object)
+    def taskFinished(self, task, error):
+        if error:
+            self.failed.emit(task, error)
+        else:
+            self.saved.emit(task)
+
+    def isBusy(self):
+        return self._pool.isBusy()
+
+    def waitForDone(self, msecs=-1):
+        '''
+        Block until every pending write is on disk.
+        '''
+        return self._pool.waitForDone(msecs)
@@ -0,0 +1,358 @@
+# Selection sync engine for nuPicker.
+# Matches the Maya selection against the objects bound to picker buttons
+# through a reverse index, so the cost of a sync follows the size of the
+# selection instead of the size of the layout.
+
+PATH_SEP = '|'
+NS_SEP = ':'
+
+
+def pathKeys(path):
+    '''
+    Return every suffix of a long DAG path that starts on a path or
+    namespace boundary, longest first.
+        '|grp|ns:arm_ctrl' -> ['grp|ns:arm_ctrl', 'ns:arm_ctrl', 'arm_ctrl']
+    '''
+    path = path.lstrip(PATH_SEP)
+    keys = [path]
+    for i, ch in enumerate(path):
+        if ch == PATH_SEP or ch == NS_SEP:
+            keys.append(path[i+1:])
+    return keys
+
+def nameKeys(path):
+    '''
+    Return every suffix of the short name of a path that starts on a
+    namespace boundary, longest first.
+        'grp|ns:arm_ctrl' -> ['ns:arm_ctrl', 'arm_ctrl']
+    '''
+    name = path.split(PATH_SEP)[-1]
+    keys = [name]
+    for i, ch in enumerate(name):
+        if ch == NS_SEP:
+            keys.append(name[i+1:])
+    return keys
+
+def namespaceKeys(namespace):
+    '''
+    Return every suffix of a namespace that starts on a namespace boundary.
+        'char:face:' -> ['char:face:', 'face:']
+    '''
+    if not namespace:
+        return []
+    keys = [namespace]
+    for i, ch in enumerate(namespace[:-1]):
+        if ch == NS_SEP:
+            keys.append(namespace[i+1:])
+    return keys
+
+def stripNamespace(path, namespace):
+    '''
+    Remove the namespace from every part of a path.
+    Returns None if any part of the path is not in the namespace.
+        'ns:grp|ns:arm_ctrl', 'ns:' -> 'grp|arm_ctrl'
+    '''
+    if not namespace:
+        return path
+    nsLen = len(namespace)
+    parts = []
+    for part in path.split(PATH_SEP):
+        if not part.startswith(namespace):
+            return None
+        parts.append(part[nsLen:])
+    return PATH_SEP.join(parts)
+
+def inNamespace(name, namespace):
+    '''
+    Return True if a node short name is in the namespace. With no namespace
+    only the nodes that have none are in it, so a UUID shared by the
+    references of a rig never picks one of them at random.
+    '''
+    if not namespace:
+        return ':' not in name
+    return name.startswith(namespace)
+
+
+class SelectionSync(object):
+    '''
+    Reverse index from bound object paths to the buttons that use them.
+
+    Object paths are stored without namespace, as the buttons keep them.
+    With the namespace of the layout applied to every part of the path,
+    a selected node matches a bound object when either
+        - the node long path ends with the object path, or
+        - the object path ends with the node short name (short-name fallback)
+    where both comparisons are made on path and namespace boundaries.
+    Objects bound with a UUID also match the selected node carrying that UUID
+    as long as the node is in the namespace, so renamed or reparented controls
+    keep matching. Paths stay the fallback for objects without UUID and for
+    rigs reused under another namespace.
+
+    A button matches when every one of its objects is matched by the selection.
+
+    The last synced selection is kept, so each sync only visits the nodes
+    added to or removed from the selection since the previous one.
+    '''
+    def __init__(self, namespace=''):
+        self._namespace = namespace
+        self._nsKeys = namespaceKeys(namespace)
+
+        self._buttons = {}  # button: [path, ...]
+        self._paths = {}  # object path: set((button, objIndex), ...)
+        self._names = {}  # object short name suffix: set((button, objIndex), ...)
+        self._lastNames = {}  # object short name: set((button, objIndex), ...)
+        self._uuids = {}  # object UUID: set((button, objIndex), ...)
+        self._buttonUuids = {}  # button: [uuid, ...]
+
+        # selection state
+        self._selection = {}  # node long name: node UUID
+        self._selUuids = {}  # node UUID, for nodes in the namespace: set(node, ...)
+        self._selPaths = {}  # node path suffix without namespace: set(node, ...)
+        self._selNames = {}  # node short name: set(node, ...)
+        self._hits = {}  # (button, objIndex): number of selected nodes matching it
+        self._needed = {}  # button: number of objects not matched yet, if any is matched
+        self._matched = set()  # buttons with all objects matched
+
+    def __len__(self):
+        return len(self._buttons)
+
+    def __contains__(self, button):
+        return button in self._buttons
+
+    def buttons(self):
+        return list(self._buttons)
+
+    def namespace(self):
+        return self._namespace
+
+    def isMatched(self, button):
+        return button in self._matched
+
+    def matchedButtons(self):
+        return set(self._matched)
+
+    def setNamespace(self, namespace):
+        '''
+        Change the namespace applied to the object paths. The index is
+        namespace free, so only the selection state is dropped and the
+        next sync starts from scratch.
+        '''
+        if namespace == self._namespace:
+            return
+        self.reset()
+        self._namespace = namespace
+        self._nsKeys = namespaceKeys(namespace)
+
+    def watch(self, button, paths, uuids=None):
+        '''
+        Start watching a button bound to the given object paths and their
+        UUIDs, if any (legacy bindings have none).
+        Returns True if the button is matched by the current selection.
+        Buttons with no object are never matched.
+        '''
+        self.unwatch(button)
+        paths = [p.lstrip(PATH_SEP) for p in paths]
+        if not paths:
+            return False
+
+        uuids = list(uuids or [])
+        uuids.extend([None] * (len(paths) - len(uuids)))
+        self._buttons[button] = paths
+        self._buttonUuids[button] = uuids
+        needed = len(paths)
+        for i, path in enumerate(paths):
+            entry = (button, i)
+            self._paths.setdefault(path, set()).add(entry)
+            self._lastNames.setdefault(path.split(PATH_SEP)[-1], set()).add(entry)
+            for key in nameKeys(path):
+                self._names.setdefault(key, set()).add(entry)
+            if uuids[i]:
+                self._uuids.setdefault(uuids[i], set()).add(entry)
+
+            # count what is already selected
+            if self._selection:
+                count = len(self._selectedFor(path, uuids[i]))
+                if count:
+                    self._hits[entry] = count
+                    needed -= 1
+
+        if needed < len(paths):
+            self._needed[button] = needed
+        if needed == 0:
+            self._matched.add(button)
+            return True
+        return False
+
+    def unwatch(self, button):
+        paths = self._buttons.pop(button, None)
+        if not paths:
+            return
+
+        uuids = self._buttonUuids.pop(button)
+        for i, path in enumerate(paths):
+            entry = (button, i)
+            self._hits.pop(entry, None)
+            self._discard(self._paths, path, entry)
+            if uuids[i]:
+                self._discard(self._uuids, uuids[i], entry)
+            self._discard(self._lastNames, path.split(PATH_SEP)[-1], entry)
+            for key in nameKeys(path):
+                self._discard(self._names, key, entry)
+        self._needed.pop(button, None)
+        self._matched.discard(button)
+
+    def clear(self):
+        self._buttons.clear()
+        self._paths.clear()
+        self._names.clear()
+        self._lastNames.clear()
+        self._uuids.clear()
+        self._buttonUuids.clear()
+        self.reset()
+
+    def reset(self):
+        '''
+        Forget the last synced selection, the next sync starts from scratch.
+        '''
+        self._selection.clear()
+        self._selUuids.clear()
+        self._selPaths.clear()
+        self._selNames.clear()
+        self._hits.clear()
+        self._needed.clear()
+        self._matched.clear()
+
+    def match(self, node, uuid=None):
+        '''
+        Return the set of (button, objIndex) matched by a selected node long name
+        and its UUID.
+        '''
+        entries = set()
+        if uuid and self.inNamespace(node):
+            found = self._uuids.get(uuid)
+            if found:
+                entries.update(found)
+
+        for key in pathKeys(node):
+            key = stripNamespace(key, self._namespace)
+            if key is None:
+                continue
+            found = self._paths.get(key)
+            if found:
+                entries.update(found)
+
+        name = node.split(PATH_SEP)[-1]
+        found = self._names.get(name)
+        if found:
+            entries.update(found)
+
+        # short name carrying (part of) the namespace
+        for nsKey in self._nsKeys:
+            if name.startswith(nsKey):
+                found = self._lastNames.get(name[len(nsKey):])
+                if found:
+                    entries.update(found)
+        return entries
+
+    def inNamespace(self, node):
+        return inNamespace(node.split(PATH_SEP)[-1], self._namespace)
+
+    def sync(self, nodes, uuids=None):
+        '''
+        Update the state to a new selection, given as node long names and
+        optionally the matching list of node UUIDs.
+        Returns (on, off), the sets of buttons that became matched and
+        the ones that are not matched anymore.
+        '''
+        if uuids:
+            nodes = dict(zip(nodes, uuids))
+        else:
+            nodes = dict.fromkeys(nodes)
+        added = [n for n in nodes if n not in self._selection]
+        removed = [n for n in self._selection if n not in nodes]
+        # a node that kept its name but changed UUID is a different node
+        for node in nodes:
+            if node in self._selection and self._selection[node] != nodes[node]:
+                added.append(node)
+                removed.append(node)
+        if not added and not removed:
+            return set(), set()
+
+        touched = set()
+        for node in removed:
+            uuid = self._removeNode(node)
+            for entry in self.match(node, uuid):
+                count = self._hits[entry] - 1
+                if count:
+                    self._hits[entry] = count
+                    continue
+                del self._hits[entry]
+                button = entry[0]
+                touched.add(button)
+                self._needed[button] += 1
+
+        for node in added:
+            self._addNode(node, nodes[node])
+            for entry in self.match(node, nodes[node]):
+                count = self._hits.get(entry, 0) + 1
+                self._hits[entry] = count
+                if count > 1:
+                    continue
+                button = entry[0]
+                touched.add(button)
+                self._needed[button] = self._needed.get(button, len(self._buttons[button])) - 1
+
+        on, off = set(), set()
+        for button in touched:
+            needed = self._needed[button]
+            if needed == len(self._buttons[button]):
+                del self._needed[button]
+
+            if needed == 0 and button not in self._matched:
+                self._matched.add(button)
+                on.add(button)
+            elif needed != 0 and button in self._matched:
+                self._matched.discard(button)
+                off.add(button)
+        return on, off
+
+    def _selectedFor(self, path, uuid=None):
+        nodes = set(self._selPaths.get(path, ()))
+        if uuid:
+            nodes.update(self._selUuids.get(uuid, ()))
+        for key in nameKeys(path):
+            nodes.update(self._selNames.get(key, ()))
+
+        name = path.split(PATH_SEP)[-1]
+        for nsKey in self._nsKeys:
+            nodes.update(self._selNames.get(nsKey + name, ()))
+        return nodes
+
+    def _addNode(self, node, uuid=None):
+        self._selection[node] = uuid
+        if uuid and self.inNamespace(node):
+            self._selUuids.setdefault(uuid, set()).add(node)
+        for key in pathKeys(node):
+            key = stripNamespace(key, self._namespace)
+            if key is not None:
+                self._selPaths.setdefault(key, set()).add(node)
+        self._selNames.setdefault(node.split(PATH_SEP)[-1], set()).add(node)
+
+    def _removeNode(self, node):
+        uuid = self._selection.pop(node)
+        if uuid:
+            self._discard(self._selUuids, uuid, node)
+        for key in pathKeys(node):
+            key = stripNamespace(key, self._namespace)
+            if key is not None:
+                self._discard(self._selPaths, key, node)
+        self._discard(self._selNames, node.split(PATH_SEP)[-1], node)
+        return uuid
+
+    def _discard(self, index, key, entry):
+        entries = index.get(key)
+        if entries is None:
+            return
+        entries.discard(entry)
+        if not entries:
+            del index[key]
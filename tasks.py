@@ -0,0 +1,76 @@
+# Worker tasks for nuPicker.
+# Loading, saving, background decoding and library scans run as QRunnables
+# on thread pools of their own, separate from the global pool Maya may use.
+# Qt doesn't own the tasks, they stay referenced by their pool until done so
+# their queued signals never refer to a deleted task.
+
+import threading
+
+from PySide2 import QtCore
+
+
+class Task(QtCore.QRunnable):
+    '''
+    Base of the worker tasks. Subclasses set Signals to their QObject class
+    of signals, made as task.signals, and implement work.
+    isDone is True once work returned, or once the task is taken out of the queue.
+    '''
+    Signals = None
+
+    def __init__(self):
+        super(Task, self).__init__()
+        self.setAutoDelete(False)
+        self.signals = self.Signals() if self.Signals else None
+        self._done = threading.Event()
+
+    def run(self):
+        try:
+            self.work()
+        finally:
+            self._done.set()
+
+    def work(self):
+        raise NotImplementedError
+
+    def isDone(self):
+        return self._done.is_set()
+
+
+class TaskPool(object):
+    '''
+    Thread pool keeping the tasks it started referenced until they are done.
+    '''
+    def __init__(self, maxThreads=None):
+        self._pool = QtCore.QThreadPool()
+        if maxThreads:
+            self._pool.setMaxThreadCount(maxThreads)
+        self._tasks = set()
+
+    def start(self, task):
+        # forget the tasks that finished since the last call
+        for done in [t for t in self._tasks if t.isDone()]:
+            self._tasks.discard(done)
+        self._tasks.add(task)
+        self._pool.start(task)
+        return task
+
+    def tryTake(self, task):
+        '''
+        Take a task that hasn't started out of the queue, it is done then.
+        Returns False if it has started, or always on the builds older than
+        Qt 5.9 that have no QThreadPool.tryTake.
+        '''
+        if not hasattr(self._pool, 'tryTake') or not self._pool.tryTake(task):
+            return False
+        task._done.set()
+        self._tasks.discard(task)
+        return True
+
+    def isBusy(self):
+        return any(not t.isDone() for t in self._tasks)
+
+    def waitForDone(self, msecs=-1):
+        '''
+        Block until every started task is done.
+        '''
+        return self._pool.waitForDone(msecs)
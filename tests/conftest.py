@@ -0,0 +1,5 @@
+# The picker modules are imported as top level modules, as Maya does.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,142 @@
+# .npk reading and writing: v2/v3 round trips, the legacy pickle migration
+# and the errors a bad file must raise.
+
+import os
+import pickle
+import struct
+
+import pytest
+
+import benchnpk
+import npk
+
+
+def sortedButtons(buttons):
+    return sorted(buttons, key=lambda button: (button[6], button[0]))
+
+
+#### round trip
+@pytest.mark.parametrize('compression', npk.availableCompressions())
+def test_roundTrip(compression):
+    name, buttons, background = benchnpk.makeLayout(300, 2048, withUuids=True)
+    data = npk.dumps(name, buttons, background, compression=compression)
+    assert npk.compressionOf(data) == compression
+    assert npk.HEADER.unpack_from(data)[1] == (npk.VERSION if compression else npk.PLAIN_VERSION)
+    assert npk.loads(data) == (name, buttons, background)
+
+@pytest.mark.parametrize('compression', npk.availableCompressions())
+def test_roundTripFile(tmpdir, compression):
+    name, buttons, background = benchnpk.makeLayout(20, 256, withUuids=True)
+    path = str(tmpdir.join('layout.npk'))
+    npk.write(path, name, buttons, background, compression=compression)
+    npk.write(path, name, buttons[:10], None, compression=compression)  # over the first one
+    assert npk.read(path) == (name, buttons[:10], None)
+    assert os.listdir(str(tmpdir)) == ['layout.npk']
+
+def test_buttonsAtSamePosition():
+    # the legacy dict kept one button per position, v2 keeps them all
+    buttons = [['a', [1.0, 1.0], 1.0, [255, 0, 0], ['rig|ctrl_a'], ['UUID-A'], (10.0, 20.0)],
+            ['b', [1.0, 1.0], 1.0, [0, 255, 0], ['rig|ctrl_b'], ['UUID-B'], (10.0, 20.0)]]
+    assert npk.loads(npk.dumps('same', buttons))[1] == buttons
+
+def test_missingUuidsReadAsNone():
+    buttons = [['a', [1.0, 1.0], 1.0, [0, 0, 0], ['ctrl_a', 'ctrl_b'], ['UUID-A'], (0.0, 0.0)]]
+    assert npk.loads(npk.dumps('', buttons))[1][0][5] == ['UUID-A', None]
+
+#### legacy
+@pytest.mark.parametrize('protocol', range(pickle.HIGHEST_PROTOCOL + 1))
+def test_legacyMigration(protocol):
+    name, buttons, background = benchnpk.makeLayout(200, 1024)
+    data = benchnpk.legacyDumps(name, buttons, background, protocol)
+    legacyName, legacyButtons, legacyBackground = npk.loads(data)
+    assert legacyName == name
+    assert legacyBackground == background
+    assert sortedButtons(legacyButtons) == sortedButtons(buttons)
+    assert npk.loadsInfo(data)[0]['version'] == 1
+
+def test_legacyPython2Strings():
+    # what Maya's Python 2 pickled, the background str comes back as latin-1 text
+    data = (b"(dp0\nS'name'\np1\nS'body'\np2\nsS'bg'\np3\nS'\\x89PNG\\xff'\np4\n"
+            b"s(F1.5\nF2.0\ntp5\n(lp6\nS'c0'\np7\na(lp8\nF1.0\naF1.0\naaF0.5\n"
+            b"a(lp9\nI255\naI0\naI0\naa(lp10\nS'rig|ctrl'\np11\naas.")
+    assert npk.loads(data) == ('body', [['c0', [1.0, 1.0], 0.5, [255, 0, 0], ['rig|ctrl'], [], (1.5, 2.0)]],
+                               b'\x89PNG\xff')
+
+class Exploit(object):
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return os.system, ('rm {}'.format(self.path),)
+
+def test_legacyRefusesCode(tmpdir):
+    marker = tmpdir.join('marker')
+    marker.write('')
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        data = pickle.dumps({'name': 'x', (0, 0): Exploit(str(marker))}, protocol)
+        with pytest.raises(npk.NpkError, match='refusing'):
+            npk.loads(data)
+    assert marker.check()
+
+@pytest.mark.parametrize('layout', [
+    [],
+    {(0, 0): 3},
+    {(0, 0): ['a', [1, 1], 1]},
+    {'x': ['a', [1, 1], 1, [0, 0, 0], []]},
+    {(0, 0): None},
+])
+def test_legacyInvalidButtons(layout):
+    with pytest.raises(npk.NpkError):
+        npk.loads(pickle.dumps(layout))
+
+#### errors
+@pytest.mark.parametrize('compression', npk.availableCompressions())
+def test_truncated(compression):
+    name, buttons, background = benchnpk.makeLayout(5, 16, withUuids=True)
+    data = npk.dumps(name, buttons, background, compression=compression)
+    for size in range(len(data)):
+        with pytest.raises(npk.NpkError):
+            npk.loads(data[:size])
+
+def sectionOffset(data, tag):
+    offset = npk.HEADER.size
+    while True:
+        sectionTag, size = npk.SECTION.unpack_from(data, offset)
+        if sectionTag == tag:
+            return offset + npk.SECTION.size, size
+        offset += npk.SECTION.size + size
+
+def test_invalidUtf8():
+    data = npk.dumps('name', [])
+    offset, size = sectionOffset(data, npk.STRS)
+    data = data[:offset + size - 1] + b'\xff' + data[offset + size:]
+    with pytest.raises(npk.NpkError, match='string table'):
+        npk.loads(data)
+
+def test_invalidStringIndex():
+    data = npk.dumps('name', [])
+    offset, size = sectionOffset(data, npk.META)
+    data = data[:offset] + npk.UINT.pack(99) + data[offset + size:]
+    with pytest.raises(npk.NpkError, match='string index'):
+        npk.loads(data)
+
+def test_corruptCompressedSection():
+    if 'zlib' not in npk.availableCompressions():
+        pytest.skip('no zlib')
+    data = npk.dumps('name', [], compression='zlib')
+    offset, size = sectionOffset(data, npk.STRS)
+    data = data[:offset] + b'\0' * size + data[offset + size:]
+    with pytest.raises(npk.NpkError, match='Corrupted'):
+        npk.loads(data)
+
+@pytest.mark.parametrize('version, flags', [(npk.VERSION + 1, 0), (npk.PLAIN_VERSION, 9)])
+def test_unknownHeader(version, flags):
+    data = npk.dumps('name', [])
+    data = struct.pack('<4sHH', npk.MAGIC, version, flags) + data[8:]
+    with pytest.raises(npk.NpkError):
+        npk.loads(data)
+
+@pytest.mark.parametrize('data', [b'', b'garbage', b'NU', b'\x80\x04K\x01.'])
+def test_notALayout(data):
+    with pytest.raises(npk.NpkError):
+        npk.loads(data)
@@ -0,0 +1,161 @@
+# npktool checks, output paths and jobs, run in this process.
+
+import os
+import pickle
+
+import pytest
+
+import benchnpk
+import npk
+import npktool
+
+
+def pickButton(exe=('rig|ctrl',), uuids=(), pos=(0.0, 0.0), size=(1.0, 1.0), opacity=1.0, color=(255, 0, 0)):
+    return ['c', list(size), opacity, list(color), list(exe), list(uuids), pos]
+
+def cmdButton(exe):
+    return ['IK', [1.0, 1.0], 1.0, [0, 0, 0], exe, [], (0.0, 0.0)]
+
+def job(action, path, compression='', dryRun=False, target=None):
+    return action, path, {'compression': compression, 'dryRun': dryRun, 'target': target or path}
+
+def makeLayout(count=20, withUuids=True):
+    name, buttons, background = benchnpk.makeLayout(count, 64, withUuids)
+    return name, buttons, b'\x89PNG' + background  # a png for imageFormat
+
+def writeLayout(path, compression='', count=20):
+    name, buttons, background = makeLayout(count)
+    npk.write(path, name, buttons, background, compression=compression)
+    return name, buttons, background
+
+
+#### checks
+def test_checkButtonsValid():
+    buttons = [pickButton(uuids=['UUID-1']), cmdButton('<python>print(1)')]
+    assert npktool.checkButtons(buttons) == ([], [])
+
+@pytest.mark.parametrize('button', [
+    pickButton(pos=(float('nan'), 0.0)),
+    pickButton(size=(float('inf'), 1.0)),
+    pickButton(opacity='1'),
+    pickButton(color=(256, 0, 0)),
+    pickButton(color=(0, 0)),
+    pickButton(color=(0.5, 0, 0)),
+])
+def test_checkButtonsErrors(button):
+    errors, warnings = npktool.checkButtons([pickButton(), button])
+    assert len(errors) == 1
+    assert errors[0].startswith('button 1 ')
+
+def test_checkButtonsWarnings():
+    buttons = [pickButton(exe=[]), pickButton(exe=[]),
+            pickButton(exe=['a', 'b'], uuids=['UUID-1']),
+            cmdButton('<mel>  '), cmdButton('')]
+    errors, warnings = npktool.checkButtons(buttons)
+    assert errors == []
+    assert warnings == ['button 2 has 2 objects but 1 UUIDs',
+                        '2 pick buttons are not bound to any object',
+                        '2 command buttons have no command']
+
+#### output paths
+def test_outputPathInPlace():
+    assert npktool.outputPath('layouts/body.npk', '', ['layouts']) == 'layouts/body.npk'
+
+def test_outputPathKeepsFolders(tmpdir):
+    root = tmpdir.mkdir('layouts')
+    path = str(root.mkdir('chars').join('body.npk'))
+    out = str(tmpdir.join('out'))
+    assert npktool.outputPath(path, out, [str(root)]) == os.path.join(out, 'chars', 'body.npk')
+
+def test_outputPathOfFileArgument(tmpdir):
+    # a file given on the command line goes to the top of the output directory
+    root = tmpdir.mkdir('layouts')
+    path = str(root.join('body.npk'))
+    assert npktool.outputPath(path, 'out', [path]) == os.path.join('out', 'body.npk')
+
+def test_outputPathSiblingPrefix(tmpdir):
+    # 'layouts2' is not inside 'layouts'
+    root = tmpdir.mkdir('layouts')
+    path = str(tmpdir.mkdir('layouts2').join('body.npk'))
+    assert npktool.outputPath(path, 'out', [str(root)]) == os.path.join('out', 'body.npk')
+
+#### jobs
+@pytest.mark.parametrize('compression', npk.availableCompressions())
+def test_convert(tmpdir, compression):
+    path = str(tmpdir.join('body.npk'))
+    target = str(tmpdir.join('out', 'body.npk'))
+    layout = writeLayout(path)
+    result = npktool.runJob(job('convert', path, compression, target=target))
+    assert result['status'] == npktool.OK
+    assert result['messages'] == ['written to {}'.format(target)]
+    assert result['sizeOut'] == os.path.getsize(target)
+    assert npk.compressionOf(open(target, 'rb').read()) == compression
+    assert npk.read(target) == layout
+
+def test_convertUnchanged(tmpdir):
+    path = str(tmpdir.join('body.npk'))
+    writeLayout(path)
+    before = os.path.getmtime(path)
+    result = npktool.runJob(job('convert', path))
+    assert result['messages'] == ['unchanged']
+    assert os.path.getmtime(path) == before
+
+def test_convertLegacy(tmpdir):
+    path = tmpdir.join('body.npk')
+    name, buttons, background = makeLayout(withUuids=False)
+    path.write_binary(benchnpk.legacyDumps(name, buttons, background, 0))
+    result = npktool.runJob(job('convert', str(path)))
+    assert result['status'] == npktool.WARNING
+    assert result['messages'] == ['legacy pickle file']
+    # the legacy buttons have no UUIDs, they are written as unbound ones
+    converted = [button[:5] + [button[6]] for button in npk.read(str(path))[1]]
+    legacy = [button[:5] + [button[6]] for button in npk.loads(benchnpk.legacyDumps(name, buttons, background, 0))[1]]
+    assert converted == legacy
+    assert path.read_binary().startswith(npk.MAGIC)
+
+def test_dryRun(tmpdir):
+    path = tmpdir.join('body.npk')
+    name, buttons, background = makeLayout(withUuids=False)
+    data = benchnpk.legacyDumps(name, buttons, background, 2)
+    path.write_binary(data)
+    target = tmpdir.join('out', 'body.npk')
+    result = npktool.runJob(job('convert', str(path), dryRun=True, target=str(target)))
+    assert result['sizeIn'] == len(data)
+    assert result['sizeOut'] == len(npk.dumps(*npk.loads(data)))
+    assert path.read_binary() == data
+    assert not target.check()
+    assert not tmpdir.join('out').check()
+
+def test_convertSkipsErrors(tmpdir):
+    path = tmpdir.join('body.npk')
+    # only a legacy file can hold a color out of range
+    path.write_binary(benchnpk.legacyDumps('body', [pickButton(color=(300, 0, 0))], None, 2))
+    data = path.read_binary()
+    result = npktool.runJob(job('convert', str(path), target=str(tmpdir.join('out.npk'))))
+    assert result['status'] == npktool.ERROR
+    assert path.read_binary() == data
+    assert not tmpdir.join('out.npk').check()
+
+@pytest.mark.parametrize('data', [b'NUPK\x02', b'garbage', pickle.dumps({(0, 0): 3})])
+def test_invalidFile(tmpdir, data):
+    path = tmpdir.join('body.npk')
+    path.write_binary(data)
+    result = npktool.runJob(job('validate', str(path)))
+    assert result['status'] == npktool.ERROR
+    assert len(result['messages']) == 1
+
+def test_missingFile(tmpdir):
+    result = npktool.runJob(job('inspect', str(tmpdir.join('missing.npk'))))
+    assert result['status'] == npktool.ERROR
+
+def test_inspect(tmpdir):
+    path = str(tmpdir.join('body.npk'))
+    name, buttons, background = writeLayout(path, count=30)
+    result = npktool.runJob(job('inspect', path))
+    assert result['status'] == npktool.OK
+    assert result['messages'] == []
+    info = result['info']
+    assert info['name'] == name
+    assert info['buttons'] + info['commands'] == len(buttons)
+    assert info['backgroundSize'] == len(background)
+    assert info['version'] == npk.PLAIN_VERSION
@@ -0,0 +1,199 @@
+# Selection sync engine against the matching loop scriptJobWatch used before it.
+# The generated layouts stay inside the cases both agree on, every intended
+# difference is checked on its own below.
+
+import random
+
+import pytest
+
+import sync
+
+
+def legacyMatched(watchButtons, namespace, sels):
+    '''
+    The baseline scriptJobWatch loop. watchButtons is {button: [obj, ...]}
+    with the objects as bound (no namespace), sels are selected long names.
+    '''
+    matched = set()
+    lenSels = len(sels)
+    for b, objs in watchButtons.items():
+        objs = ['|'.join('{}{}'.format(namespace, s) for s in o.split('|')) for o in objs]
+        lenObjs = len(objs)
+        if lenObjs > lenSels:
+            continue
+
+        f = 0
+        for s in sels:
+            for obj in objs:
+                if s.endswith(obj) or obj.endswith(s.split('|')[-1]):
+                    f += 1
+                    break
+
+        if f == lenObjs:
+            matched.add(b)
+    return matched
+
+
+def makeRig(groups=8, controls=12):
+    '''
+    Return the long paths of a rig, without namespace. Short names are unique
+    and zero padded, so a plain endswith never matches across names.
+    '''
+    paths = []
+    for g in range(groups):
+        for c in range(controls):
+            paths.append('rig|grp_{:02d}|ctrl_{:02d}_{:02d}'.format(g, g, c))
+    return paths
+
+def bindAs(rng, path):
+    # the ways objects end up bound: full path, partial path or short name
+    parts = path.split('|')
+    return '|'.join(parts[rng.randint(0, len(parts) - 1):])
+
+def makeLayout(rng, paths, count=60):
+    layout = {}
+    for i in range(count):
+        objs = rng.sample(paths, rng.randint(1, 4))
+        layout['button{}'.format(i)] = [bindAs(rng, p) for p in objs]
+    return layout
+
+def longName(path, namespace):
+    return '|' + '|'.join(namespace + part for part in path.split('|'))
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('namespace', ['', 'char:', 'char:face:'])
+def test_matchesLegacy(seed, namespace):
+    rng = random.Random(seed)
+    paths = makeRig()
+    layout = makeLayout(rng, paths)
+
+    engine = sync.SelectionSync(namespace)
+    for button, objs in layout.items():
+        engine.watch(button, objs)
+
+    # a run of selection changes, each sync only sees the difference
+    for _ in range(15):
+        chosen = rng.sample(paths, rng.randint(0, 40))
+        # pick whole buttons too, or most selections match nothing
+        for button in rng.sample(sorted(layout), 3):
+            chosen.extend(p for p in paths for obj in layout[button] if p.endswith(obj))
+        sels = sorted(set(longName(p, namespace) for p in chosen))
+
+        engine.sync(sels)
+        assert engine.matchedButtons() == legacyMatched(layout, namespace, sels)
+
+def test_matchesLegacyAfterRewatch():
+    # buttons rebound while the selection is up keep agreeing
+    rng = random.Random(7)
+    paths = makeRig()
+    layout = makeLayout(rng, paths)
+    engine = sync.SelectionSync()
+    for button, objs in layout.items():
+        engine.watch(button, objs)
+    sels = ['|' + p for p in rng.sample(paths, 50)]
+    engine.sync(sels)
+
+    for button in rng.sample(sorted(layout), 20):
+        layout[button] = [bindAs(rng, p) for p in rng.sample(sels, 2)]
+        engine.watch(button, layout[button])
+    assert engine.matchedButtons() == legacyMatched(layout, '', sels)
+
+
+#### intended differences
+def test_eachObjectMustBeMatched():
+    # two selected nodes matching the same short name used to count as two objects
+    layout = {'button': ['ctrl_a', 'ctrl_b']}
+    sels = ['|rigA|ctrl_a', '|rigB|ctrl_a']
+    assert legacyMatched(layout, '', sels) == {'button'}
+
+    engine = sync.SelectionSync()
+    engine.watch('button', layout['button'])
+    engine.sync(sels)
+    assert not engine.isMatched('button')
+
+def test_extraMatchingNodeKeepsButtonMatched():
+    # a third node matching one of the objects used to break the count
+    layout = {'button': ['ctrl_a', 'ctrl_b']}
+    sels = ['|rigA|ctrl_a', '|rigB|ctrl_a', '|rigA|ctrl_b']
+    assert legacyMatched(layout, '', sels) == set()
+
+    engine = sync.SelectionSync()
+    engine.watch('button', layout['button'])
+    engine.sync(sels)
+    assert engine.isMatched('button')
+
+def test_unboundButtonIsNeverMatched():
+    # buttons with no object used to light up on every selection change
+    layout = {'button': []}
+    sels = ['|rig|ctrl_a']
+    assert legacyMatched(layout, '', sels) == {'button'}
+
+    engine = sync.SelectionSync()
+    assert engine.watch('button', []) is False
+    engine.sync(sels)
+    assert not engine.isMatched('button')
+
+def test_matchOnNameBoundaries():
+    # a plain endswith matched 'larm_ctrl' for an object bound as 'arm_ctrl'
+    layout = {'button': ['arm_ctrl']}
+    sels = ['|rig|larm_ctrl']
+    assert legacyMatched(layout, '', sels) == {'button'}
+
+    engine = sync.SelectionSync()
+    engine.watch('button', layout['button'])
+    engine.sync(sels)
+    assert not engine.isMatched('button')
+
+def test_uuidMatchesRenamedNode():
+    # a renamed control is still found through the UUID it was bound with
+    layout = {'button': ['rig|arm_ctrl']}
+    sels = ['|rig|arm_ctrl_renamed']
+    assert legacyMatched(layout, '', sels) == set()
+
+    engine = sync.SelectionSync()
+    engine.watch('button', layout['button'], ['UUID-1'])
+    engine.sync(sels, ['UUID-1'])
+    assert engine.isMatched('button')
+
+def test_uuidOutsideNamespaceIsIgnored():
+    # the same rig referenced twice shares UUIDs, the namespace tells them apart
+    engine = sync.SelectionSync('charB:')
+    engine.watch('button', ['rig|arm_ctrl'], ['UUID-1'])
+    engine.sync(['|charA:rig|charA:arm_ctrl_renamed'], ['UUID-1'])
+    assert not engine.isMatched('button')
+
+def test_uuidWithoutNamespaceIgnoresReferences():
+    # with no namespace set, a UUID hit in a referenced rig is not this button's
+    engine = sync.SelectionSync('')
+    engine.watch('button', ['rig|arm_ctrl'], ['UUID-1'])
+    engine.sync(['|charB:rig|charB:arm_ctrl'], ['UUID-1'])
+    assert not engine.isMatched('button')
+
+    engine.sync(['|rig|arm_ctrl_renamed'], ['UUID-1'])
+    assert engine.isMatched('button')
+
+
+#### watching while selected
+def test_watchWhileSelected():
+    # a button created, loaded or rebound over the current selection is matched
+    # right away, and the next sync doesn't report it again
+    engine = sync.SelectionSync('char:')
+    engine.watch('other', ['rig|leg_ctrl'])
+    engine.sync(['|char:rig|char:arm_ctrl', '|char:rig|char:hand_ctrl'])
+
+    assert engine.watch('button', ['rig|arm_ctrl', 'hand_ctrl']) is True
+    assert engine.isMatched('button')
+    on, off = engine.sync(['|char:rig|char:arm_ctrl', '|char:rig|char:hand_ctrl', '|char:rig|char:leg_ctrl'])
+    assert on == {'other'}
+    assert off == set()
+
+    on, off = engine.sync(['|char:rig|char:arm_ctrl'])
+    assert off == {'button', 'other'}
+
+def test_watchWhilePartlySelected():
+    engine = sync.SelectionSync()
+    engine.sync(['|rig|arm_ctrl'])
+    assert engine.watch('button', ['rig|arm_ctrl', 'rig|hand_ctrl']) is False
+    on, off = engine.sync(['|rig|arm_ctrl', '|rig|hand_ctrl'])
+    assert on == {'button'}